@@ -1,8 +1,13 @@
+import bisect
+import math
 import unittest
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple, Dict
 
 import dataclasses
+import numpy as np
 from dataclasses import dataclass
 
 
@@ -59,6 +64,8 @@ class WireSegment(object):
     y1: float
     t0: Optional[int] = None
     t1: Optional[int] = None
+    steps: int = 0
+    """The number of steps along the wire before this segment starts. """
 
     @property
     def a(self) -> float:
@@ -111,6 +118,7 @@ class WireSegment(object):
 def build_segments_from_vectors(vector_list: List[WireVector]) -> List[WireSegment]:
     x = 0
     y = 0
+    steps = 0
     segment_list: List[WireSegment] = list()
 
     for t, vector in enumerate(vector_list):
@@ -123,20 +131,527 @@ def build_segments_from_vectors(vector_list: List[WireVector]) -> List[WireSegme
         x1 = x
         y1 = y
 
-        segment = WireSegment(x0=x0, y0=y0, x1=x1, y1=y1, t0=t, t1=t + 1)
+        segment = WireSegment(x0=x0, y0=y0, x1=x1, y1=y1, t0=t, t1=t + 1, steps=steps)
         segment_list.append(segment)
 
+        # Keep a running total of the wire length so the steps to any point can be found without walking the wire
+        steps += abs(vector.dx) + abs(vector.dy)
+
     return segment_list
 
 
+WIRE_SEGMENT_DTYPE = np.dtype([
+    ('horizontal', np.bool_),  # True if the segment runs along the x axis, False if it runs along the y axis
+    ('fixed', np.int64),  # The y value of a horizontal segment or the x value of a vertical segment
+    ('lo', np.int64),  # The smallest value of the coordinate that changes along the segment
+    ('hi', np.int64),  # The largest value of the coordinate that changes along the segment
+    ('start', np.int64),  # The value of the changing coordinate where the wire enters the segment
+    ('steps', np.int64),  # The number of steps along the wire before the segment starts
+])
+"""Row format of a wire segment table. Every value is an integer so crossings never produce float coordinates. """
+
+WIRE_CROSSING_DTYPE = np.dtype([
+    ('i', np.int64),  # Index of the segment of wire 0
+    ('j', np.int64),  # Index of the segment of wire 1
+    ('x', np.int64),
+    ('y', np.int64),
+    ('steps', np.int64),  # The combined number of steps both wires take to reach the crossing
+])
+
+
+def _build_segment_table_columns(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                                 steps: np.ndarray) -> np.ndarray:
+    """Build a segment table from the end points of every segment at once. """
+    table = np.zeros(len(x0), dtype=WIRE_SEGMENT_DTYPE)
+    horizontal = y0 == y1
+    table['horizontal'] = horizontal
+    table['fixed'] = np.where(horizontal, y0, x0)
+    table['lo'] = np.where(horizontal, np.minimum(x0, x1), np.minimum(y0, y1))
+    table['hi'] = np.where(horizontal, np.maximum(x0, x1), np.maximum(y0, y1))
+    table['start'] = np.where(horizontal, x0, y0)
+    table['steps'] = steps
+    return table
+
+
+def build_segment_table(segment_list: List[WireSegment]) -> np.ndarray:
+    """ Convert a list of axis-aligned WireSegment into a structured array with WIRE_SEGMENT_DTYPE
+
+    :param segment_list: The connected segments of a wire, ordered from the central port
+    :type segment_list: List[WireSegment]
+    :return: The segment table where row i describes segment_list[i]
+    :rtype: np.ndarray
+    """
+    x0, y0, x1, y1, steps = np.array([(s.x0, s.y0, s.x1, s.y1, s.steps) for s in segment_list],
+                                     dtype=np.int64).reshape(-1, 5).T
+    is_diagonal = (x0 != x1) & (y0 != y1)
+    if is_diagonal.any():
+        raise ValueError(f'Segment is not horizontal or vertical: {segment_list[int(is_diagonal.argmax())]}')
+    return _build_segment_table_columns(x0=x0, y0=y0, x1=x1, y1=y1, steps=steps)
+
+
+def build_segment_table_from_vectors(vector_list: List[WireVector]) -> np.ndarray:
+    """ Build the segment table of a wire directly from its vectors, without building WireSegment objects.
+    The result is the same as build_segment_table(build_segments_from_vectors(vector_list)).
+
+    :param vector_list: The vectors of a single wire
+    :type vector_list: List[WireVector]
+    :return: The segment table where row i describes vector_list[i]
+    :rtype: np.ndarray
+    """
+    dx = np.array([v.dx for v in vector_list], dtype=np.int64)
+    dy = np.array([v.dy for v in vector_list], dtype=np.int64)
+    lengths = np.abs(dx) + np.abs(dy)
+    # The end of each segment is the sum of the vectors so far, and the start is the end of the previous segment
+    x1 = np.cumsum(dx)
+    y1 = np.cumsum(dy)
+    return _build_segment_table_columns(x0=x1 - dx, y0=y1 - dy, x1=x1, y1=y1, steps=np.cumsum(lengths) - lengths)
+
+
+def find_crossing_mask(table: np.ndarray, segment: np.void) -> np.ndarray:
+    """ Check which segments in the table cross the provided segment. Parallel segments never cross.
+    The comparison is element-wise, so two segment tables of the same length can also be compared row by row.
+
+    :param table: Segment table with WIRE_SEGMENT_DTYPE
+    :type table: np.ndarray
+    :param segment: A single row with WIRE_SEGMENT_DTYPE
+    :type segment: np.void
+    :return: Boolean array that is True for every row of the table that crosses the segment
+    :rtype: np.ndarray
+    """
+    return ((table['horizontal'] != segment['horizontal']) &
+            (table['fixed'] >= segment['lo']) & (table['fixed'] <= segment['hi']) &
+            (table['lo'] <= segment['fixed']) & (table['hi'] >= segment['fixed']))
+
+
+class _BlockedSortedList(object):
+    """Sorted list that is split into blocks of at most 2 * block_size items. Adding or removing an item only shifts
+    the items of one block and the list of blocks, so each update costs O(log n + block_size + n / block_size)
+    instead of the O(n) of bisect.insort on a single list.
+    """
+
+    def __init__(self, block_size: int = 512):
+        self.block_size = block_size
+        self.blocks: List[list] = list()
+        self.maxes: list = list()
+        """The last item of each block, used to find the block of an item with a binary search. """
+
+    def add(self, item):
+        if not self.blocks:
+            self.blocks.append([item])
+            self.maxes.append(item)
+            return
+        b = min(bisect.bisect_left(self.maxes, item), len(self.blocks) - 1)
+        block = self.blocks[b]
+        bisect.insort(block, item)
+        self.maxes[b] = block[-1]
+        if len(block) > 2 * self.block_size:
+            # Split a full block in half
+            self.blocks[b:b + 1] = [block[:self.block_size], block[self.block_size:]]
+            self.maxes[b:b + 1] = [block[self.block_size - 1], block[-1]]
+
+    def remove(self, item):
+        b = bisect.bisect_left(self.maxes, item)
+        block = self.blocks[b]
+        del block[bisect.bisect_left(block, item)]
+        if block:
+            self.maxes[b] = block[-1]
+        else:
+            del self.blocks[b]
+            del self.maxes[b]
+
+    def irange(self, lo, hi):
+        """Iterate over the items from lo to hi, inclusive, in sorted order. """
+        b = bisect.bisect_left(self.maxes, lo)
+        if b == len(self.blocks):
+            return
+        i = bisect.bisect_left(self.blocks[b], lo)
+        for block in self.blocks[b:]:
+            for item in block[i:]:
+                if item > hi:
+                    return
+                yield item
+            i = 0
+
+
+def _sweep_crossing_pairs(horizontals: np.ndarray, verticals: np.ndarray) -> List[Tuple[int, int]]:
+    """ Sweep a vertical line from left to right and report every horizontal/vertical segment pair that crosses.
+
+    Horizontal segments are active while the sweep line is between their end points and are kept sorted by y in a
+    _BlockedSortedList, so each vertical segment finds the active segments within its y range with binary searches.
+    For n horizontal segments, m vertical segments and k crossings the sweep costs
+    O((n + m) log(n + m) + n * (block_size + n / block_size) + k), which is O(n sqrt(n)) in the worst case.
+
+    :param horizontals: Segment table of horizontal segments with an extra 'index' field
+    :param verticals: Segment table of vertical segments with an extra 'index' field
+    :return: List of (horizontal index, vertical index) for each crossing
+    """
+    # Events are sorted by x. When several events share the same x the horizontal segments are added first, then the
+    # vertical segments are checked and finally the horizontal segments are removed, so the end points are inclusive.
+    events = list()
+    for i, y, x_min, x_max in zip(*(horizontals[k].tolist() for k in ('index', 'fixed', 'lo', 'hi'))):
+        events.append((x_min, 0, y, i))
+        events.append((x_max, 2, y, i))
+    for j, x, y_min, y_max in zip(*(verticals[k].tolist() for k in ('index', 'fixed', 'lo', 'hi'))):
+        events.append((x, 1, y_min, y_max, j))
+    events.sort()
+
+    active = _BlockedSortedList()  # (y, index) of the active horizontal segments sorted by y
+    pair_list: List[Tuple[int, int]] = list()
+    for event in events:
+        event_type = event[1]
+        if event_type == 0:
+            active.add((event[2], event[3]))
+        elif event_type == 2:
+            active.remove((event[2], event[3]))
+        else:
+            _, _, y_min, y_max, j = event
+            for _, i in active.irange((y_min, -math.inf), (y_max, math.inf)):
+                pair_list.append((i, j))
+    return pair_list
+
+
+def find_table_crossings(table_0: np.ndarray, table_1: np.ndarray) -> np.ndarray:
+    """ Find every point where a segment of wire 0 crosses a segment of wire 1
+
+    :param table_0: Segment table of wire 0
+    :type table_0: np.ndarray
+    :param table_1: Segment table of wire 1
+    :type table_1: np.ndarray
+    :return: Array with WIRE_CROSSING_DTYPE sorted by (i, j)
+    :rtype: np.ndarray
+    """
+    def split(table: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        indexed = np.zeros(len(table), dtype=WIRE_SEGMENT_DTYPE.descr + [('index', np.int64)])
+        for name in WIRE_SEGMENT_DTYPE.names:
+            indexed[name] = table[name]
+        indexed['index'] = np.arange(len(table))
+        # Skip segments with a length of zero since they are not horizontal or vertical
+        indexed = indexed[indexed['lo'] != indexed['hi']]
+        return indexed[indexed['horizontal']], indexed[~indexed['horizontal']]
+
+    horizontals_0, verticals_0 = split(table_0)
+    horizontals_1, verticals_1 = split(table_1)
+
+    pair_list = _sweep_crossing_pairs(horizontals=horizontals_0, verticals=verticals_1)
+    pair_list.extend((i, j) for j, i in _sweep_crossing_pairs(horizontals=horizontals_1, verticals=verticals_0))
+    pair_list.sort()
+
+    crossings = np.zeros(len(pair_list), dtype=WIRE_CROSSING_DTYPE)
+    if pair_list:
+        crossings['i'], crossings['j'] = np.array(pair_list, dtype=np.int64).T
+    _fill_crossing_points(crossings=crossings, table_0=table_0, table_1=table_1)
+    return crossings
+
+
+def _fill_crossing_points(crossings: np.ndarray, table_0: np.ndarray, table_1: np.ndarray):
+    """Fill in the 'x', 'y' and 'steps' fields of crossings where the 'i' and 'j' fields are already known. """
+    # The crossing point takes its fixed coordinate from each of the two perpendicular segments
+    rows_0 = table_0[crossings['i']]
+    rows_1 = table_1[crossings['j']]
+    crossings['x'] = np.where(rows_0['horizontal'], rows_1['fixed'], rows_0['fixed'])
+    crossings['y'] = np.where(rows_0['horizontal'], rows_0['fixed'], rows_1['fixed'])
+    # Each wire reaches the crossing after the steps before the segment plus the distance along the segment
+    crossings['steps'] = (
+        rows_0['steps'] + np.abs(np.where(rows_0['horizontal'], crossings['x'], crossings['y']) - rows_0['start']) +
+        rows_1['steps'] + np.abs(np.where(rows_1['horizontal'], crossings['x'], crossings['y']) - rows_1['start'])
+    )
+
+
+RASTER_AREA_PER_SEGMENT = 4096
+"""find_wire_crossings rasterizes the wires when the bounding box has at most this many cells per wire segment. """
+
+
+def trace_wire_path(vector_list: List[WireVector]) -> Tuple[np.ndarray, np.ndarray]:
+    """ Build the x and y coordinate of every point the wire visits, excluding the central port.
+    Point k of the path is reached after k + 1 steps.
+
+    :param vector_list: The vectors of a single wire
+    :type vector_list: List[WireVector]
+    :return: The x and y coordinates of the path
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    dx = np.array([v.dx for v in vector_list], dtype=np.int64)
+    dy = np.array([v.dy for v in vector_list], dtype=np.int64)
+    lengths = np.abs(dx) + np.abs(dy)
+    # Expand each vector into unit steps and sum them to get the position after each step
+    x = np.cumsum(np.repeat(np.sign(dx), lengths))
+    y = np.cumsum(np.repeat(np.sign(dy), lengths))
+    return x, y
+
+
+def _first_visits_by_direction(vector_list: List[WireVector], cell_of: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                               ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """ Find the first time a wire visits each cell while running horizontally and while running vertically. The end
+    points of every segment are included, so a corner is visited in both directions.
+
+    :return: The (cells, steps, segment index) of the horizontal and the vertical visits, each sorted by cell
+    """
+    dx = np.array([v.dx for v in vector_list], dtype=np.int64)
+    dy = np.array([v.dy for v in vector_list], dtype=np.int64)
+    lengths = np.abs(dx) + np.abs(dy)
+    steps_before = np.cumsum(lengths) - lengths
+    is_moving = lengths != 0  # Segments with a length of zero are not horizontal or vertical
+    path_x, path_y = trace_wire_path(vector_list)
+
+    # Every point along the path and the point where each segment starts
+    segment_index = np.concatenate((np.repeat(np.arange(len(vector_list)), lengths), np.flatnonzero(is_moving)))
+    x = np.concatenate((path_x, (np.cumsum(dx) - dx)[is_moving]))
+    y = np.concatenate((path_y, (np.cumsum(dy) - dy)[is_moving]))
+    steps = np.concatenate((np.arange(1, len(path_x) + 1), steps_before[is_moving]))
+    cells = cell_of(x, y)
+
+    visit_list = list()
+    for is_direction in [dx[segment_index] != 0, dy[segment_index] != 0]:
+        # After a stable sort by steps, the first occurrence of each cell is the first visit
+        order = np.flatnonzero(is_direction)
+        order = order[np.argsort(steps[order], kind='stable')]
+        unique_cells, first_index = np.unique(cells[order], return_index=True)
+        first_visit = order[first_index]
+        visit_list.append((unique_cells, steps[first_visit], segment_index[first_visit]))
+    return visit_list
+
+
+def find_raster_crossings(vector_list_0: List[WireVector], vector_list_1: List[WireVector]) -> np.ndarray:
+    """ Find the crossings of two wires by tracing every cell each wire visits. A cell is a crossing when one wire
+    runs horizontally and the other wire runs vertically through it, so points where the wires overlap while running
+    in the same direction are ignored like in find_table_crossings. A point is only reported once, with the segments
+    of the crossing that takes the fewest combined steps, so the answers of find_closest_distance_and_fewest_steps
+    match find_table_crossings.
+
+    :param vector_list_0: The vectors of wire 0
+    :type vector_list_0: List[WireVector]
+    :param vector_list_1: The vectors of wire 1
+    :type vector_list_1: List[WireVector]
+    :return: Array with WIRE_CROSSING_DTYPE sorted by (i, j)
+    :rtype: np.ndarray
+    """
+    x_0, y_0 = trace_wire_path(vector_list_0)
+    x_1, y_1 = trace_wire_path(vector_list_1)
+    if len(x_0) == 0 or len(x_1) == 0:
+        return np.zeros(0, dtype=WIRE_CROSSING_DTYPE)
+
+    x_min = min(0, int(x_0.min()), int(x_1.min()))
+    y_min = min(0, int(y_0.min()), int(y_1.min()))
+    width = max(0, int(x_0.max()), int(x_1.max())) - x_min + 1
+
+    def cell_of(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return (y - y_min) * width + (x - x_min)
+
+    horizontal_0, vertical_0 = _first_visits_by_direction(vector_list_0, cell_of=cell_of)
+    horizontal_1, vertical_1 = _first_visits_by_direction(vector_list_1, cell_of=cell_of)
+
+    candidate_list = list()
+    for (cells_0, steps_0, index_0), (cells_1, steps_1, index_1) in [(horizontal_0, vertical_1),
+                                                                     (vertical_0, horizontal_1)]:
+        cells, at_0, at_1 = np.intersect1d(cells_0, cells_1, assume_unique=True, return_indices=True)
+        candidate = np.zeros(len(cells), dtype=WIRE_CROSSING_DTYPE)
+        candidate['i'] = index_0[at_0]
+        candidate['j'] = index_1[at_1]
+        candidate['x'] = cells % width + x_min
+        candidate['y'] = cells // width + y_min
+        candidate['steps'] = steps_0[at_0] + steps_1[at_1]
+        candidate_list.append(candidate)
+    candidates = np.concatenate(candidate_list)
+
+    # Keep the candidate with the fewest steps for each point
+    candidates = candidates[np.lexsort((candidates['steps'], candidates['x'], candidates['y']))]
+    is_first = np.ones(len(candidates), dtype=np.bool_)
+    is_first[1:] = (np.diff(candidates['x']) != 0) | (np.diff(candidates['y']) != 0)
+    crossings = candidates[is_first]
+    return crossings[np.lexsort((crossings['j'], crossings['i']))]
+
+
+def find_wire_crossings(vector_list_0: List[WireVector], vector_list_1: List[WireVector]) -> np.ndarray:
+    """ Find the crossings of two wires. Wires that are dense compared to their bounding box are rasterized, otherwise
+    the sweep line of find_table_crossings is used.
+
+    :param vector_list_0: The vectors of wire 0
+    :type vector_list_0: List[WireVector]
+    :param vector_list_1: The vectors of wire 1
+    :type vector_list_1: List[WireVector]
+    :return: Array with WIRE_CROSSING_DTYPE sorted by (i, j)
+    :rtype: np.ndarray
+    """
+    # The corners of each wire are enough to find the bounding box
+    corner_list = [(0, 0)]
+    for vector_list in [vector_list_0, vector_list_1]:
+        corner_list.extend(zip(
+            np.cumsum([v.dx for v in vector_list]).tolist(),
+            np.cumsum([v.dy for v in vector_list]).tolist(),
+        ))
+    x_list, y_list = zip(*corner_list)
+    area = (max(x_list) - min(x_list) + 1) * (max(y_list) - min(y_list) + 1)
+    num_segments = len(vector_list_0) + len(vector_list_1)
+
+    if area <= RASTER_AREA_PER_SEGMENT * num_segments:
+        return find_raster_crossings(vector_list_0=vector_list_0, vector_list_1=vector_list_1)
+    return find_table_crossings(
+        table_0=build_segment_table_from_vectors(vector_list_0),
+        table_1=build_segment_table_from_vectors(vector_list_1),
+    )
+
+
+def find_closest_distance_and_fewest_steps(crossings: np.ndarray) -> Tuple[int, int]:
+    """ Find both puzzle answers from a single set of wire crossings. Crossings at the central port are ignored.
+
+    :param crossings: Array with WIRE_CROSSING_DTYPE
+    :type crossings: np.ndarray
+    :return: The smallest Manhattan distance and the fewest combined steps to reach a crossing
+    :rtype: Tuple[int, int]
+    """
+    distances = np.abs(crossings['x']) + np.abs(crossings['y'])
+    crossings = crossings[distances != 0]
+    distances = distances[distances != 0]
+    if len(crossings) == 0:
+        raise ValueError('The wires do not cross outside of the central port')
+    return int(distances.min()), int(crossings['steps'].min())
+
+
+@dataclass
+class WirePairResult(object):
+    wire_0: int
+    wire_1: int
+    distance: int
+    """The smallest Manhattan distance from the central port to a crossing of the two wires. """
+    steps: int
+    """The fewest combined steps both wires take to reach a crossing. """
+
+
+class WireGridIndex(object):
+    """Uniform grid over the segments of many wires. Each cell holds a reference to every segment that passes through
+    it, so only segments that share a cell need to be compared. Every crossing point belongs to exactly one cell,
+    which means the cells can be processed independently of each other.
+    """
+
+    def __init__(self, table_list: List[np.ndarray], cell_size: Optional[int] = None):
+        """
+        :param table_list: A segment table for each wire
+        :type table_list: List[np.ndarray]
+        :param cell_size: The width and height of a grid cell. Defaults to the mean segment length.
+        :type cell_size: Optional[int]
+        """
+        if cell_size is None:
+            lengths = [table['hi'] - table['lo'] for table in table_list if len(table)]
+            cell_size = max(1, int(np.concatenate(lengths).mean())) if lengths else 1
+        self.table_list = table_list
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, int]]] = defaultdict(list)
+        """The (wire index, segment index) of every segment that passes through a cell, keyed by the cell. """
+
+        for w, table in enumerate(table_list):
+            fixed_cells = (table['fixed'] // cell_size).tolist()
+            lo_cells = (table['lo'] // cell_size).tolist()
+            hi_cells = (table['hi'] // cell_size).tolist()
+            for s, (horizontal, fixed_cell, lo_cell, hi_cell, length) in enumerate(
+                    zip(table['horizontal'].tolist(), fixed_cells, lo_cells, hi_cells,
+                        (table['hi'] - table['lo']).tolist())):
+                if length == 0:
+                    continue  # Skip segments with a length of zero since they are not horizontal or vertical
+                for cell in range(lo_cell, hi_cell + 1):
+                    key = (cell, fixed_cell) if horizontal else (fixed_cell, cell)
+                    self.cells[key].append((w, s))
+
+    def find_wire_pair_results(self, num_workers: int = 1) -> List[WirePairResult]:
+        """ Find the closest crossing and the fewest combined steps for every pair of wires that cross
+
+        :param num_workers: The number of processes used to search the grid cells
+        :type num_workers: int
+        :return: List of WirePairResult sorted by (wire_0, wire_1). Pairs that never cross are not included.
+        :rtype: List[WirePairResult]
+        """
+        cell_items = list(self.cells.items())
+        if num_workers > 1 and len(cell_items) > 1:
+            # Split the cells into contiguous tiles, one group per worker
+            tile_size = math.ceil(len(cell_items) / num_workers)
+            tiles = [cell_items[i:i + tile_size] for i in range(0, len(cell_items), tile_size)]
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                tile_results = list(executor.map(
+                    _search_grid_cells, [self.table_list] * len(tiles), [self.cell_size] * len(tiles), tiles))
+        else:
+            tile_results = [_search_grid_cells(self.table_list, self.cell_size, cell_items)]
+
+        # Merge the results of each tile by keeping the smallest value of each pair
+        merged: Dict[Tuple[int, int], List[int]] = dict()
+        for tile_result in tile_results:
+            for key, (distance, steps) in tile_result.items():
+                if key in merged:
+                    merged[key] = [min(merged[key][0], distance), min(merged[key][1], steps)]
+                else:
+                    merged[key] = [distance, steps]
+
+        return [
+            WirePairResult(wire_0=w0, wire_1=w1, distance=distance, steps=steps)
+            for (w0, w1), (distance, steps) in sorted(merged.items())
+        ]
+
+
+def _search_grid_cells(table_list: List[np.ndarray], cell_size: int,
+                       cell_items: List[Tuple[Tuple[int, int], List[Tuple[int, int]]]],
+                       ) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """ Compare the segments that share each cell and keep the best crossing of each wire pair.
+
+    :return: (smallest Manhattan distance, fewest combined steps) keyed by (wire_0, wire_1)
+    """
+    results: Dict[Tuple[int, int], Tuple[int, int]] = dict()
+    for (cell_x, cell_y), entry_list in cell_items:
+        segments_by_wire: Dict[int, List[int]] = defaultdict(list)
+        for w, s in entry_list:
+            segments_by_wire[w].append(s)
+        wire_list = sorted(segments_by_wire)
+
+        for a, w0 in enumerate(wire_list):
+            for w1 in wire_list[a + 1:]:
+                # Compare every segment of wire 0 in this cell against every segment of wire 1 in this cell
+                i, j = np.meshgrid(segments_by_wire[w0], segments_by_wire[w1], indexing='ij')
+                i = i.ravel()
+                j = j.ravel()
+                table_0 = table_list[w0]
+                table_1 = table_list[w1]
+                mask = find_crossing_mask(table_0[i], table_1[j])
+
+                crossings = np.zeros(int(mask.sum()), dtype=WIRE_CROSSING_DTYPE)
+                crossings['i'] = i[mask]
+                crossings['j'] = j[mask]
+                _fill_crossing_points(crossings=crossings, table_0=table_0, table_1=table_1)
+
+                # Only keep the crossings that belong to this cell so each crossing is counted once.
+                # Crossings at the central port are ignored.
+                distances = np.abs(crossings['x']) + np.abs(crossings['y'])
+                keep = ((crossings['x'] // cell_size == cell_x) & (crossings['y'] // cell_size == cell_y) &
+                        (distances != 0))
+                if not keep.any():
+                    continue
+                distance = int(distances[keep].min())
+                steps = int(crossings['steps'][keep].min())
+                if (w0, w1) in results:
+                    best_distance, best_steps = results[(w0, w1)]
+                    distance = min(distance, best_distance)
+                    steps = min(steps, best_steps)
+                results[(w0, w1)] = (distance, steps)
+    return results
+
+
+def find_crossing_segment_pairs(segments_0: List[WireSegment],
+                                segments_1: List[WireSegment]) -> List[Tuple[int, int]]:
+    """ Find the index of every pair of segments, one from each wire, that cross each other.
+
+    Only horizontal and vertical segments are considered. Parallel segments are never reported which matches the
+    behavior of WireSegment.intersection.
+
+    :param segments_0: The segments of wire 0
+    :param segments_1: The segments of wire 1
+    :return: Sorted list of (i, j) where segments_0[i] crosses segments_1[j]
+    """
+    crossings = find_table_crossings(table_0=build_segment_table(segments_0), table_1=build_segment_table(segments_1))
+    return list(zip(crossings['i'].tolist(), crossings['j'].tolist()))
+
+
 def find_intersection_points(segments_0: List[WireSegment], segments_1: List[WireSegment]) -> List[WirePoint]:
+    crossings = find_table_crossings(table_0=build_segment_table(segments_0), table_1=build_segment_table(segments_1))
     intersections: List[WirePoint] = list()
-    for s0 in segments_0:
-        for s1 in segments_1:
-            # Determine if the two segments intersect
-            x_point = s0.intersection(other=s1)
-            if x_point:
-                intersections.append(x_point)
+    for i, j, x, y, _ in crossings.tolist():
+        t_list = segments_0[i].t_list + segments_1[j].t_list
+        intersections.append(WirePoint(x=x, y=y, t_list=t_list))
     return intersections
 
 
@@ -155,38 +670,37 @@ class WireLoop(object):
 
 def find_intersection_loops(segments_0: List[WireSegment], segments_1: List[WireSegment]) -> List[WireLoop]:
     wire_loop_list: List[WireLoop] = list()
-    for i, si in enumerate(segments_0):
-        for j, sj in enumerate(segments_1):
-            # Determine if the two segments intersect
-            x_point = si.intersection(other=sj)
-            if x_point:
-                # Build a list of the previous segments for each wire
-                # This will not include the two segments which intersect
-                s0_to_si_minus_1 = segments_0[0:i]
-                s1_to_sj_minus_1 = segments_1[0:j]
-
-                # Build a segment from the start point to the intersection point for both wires
-                s0_sub_segment = WireSegment(
-                    x0=si.x0,
-                    x1=x_point.x,
-                    y0=si.y0,
-                    y1=x_point.y,
-                )
-                s1_sub_segment = WireSegment(
-                    x0=sj.x0,
-                    x1=x_point.x,
-                    y0=sj.y0,
-                    y1=x_point.y,
-                )
-
-                # The WireLoop object is a list of connected WireSegment that eventually loops back to the start.
-                segment_list = s0_to_si_minus_1
-                segment_list.append(s0_sub_segment)
-                segment_list.append(s1_sub_segment)
-                # Reverse the segment list of the second wire
-                segment_list.extend(list(reversed(s1_to_sj_minus_1)))
-                wire_loop = WireLoop(segment_list=segment_list)
-                wire_loop_list.append(wire_loop)
+    crossings = find_table_crossings(table_0=build_segment_table(segments_0), table_1=build_segment_table(segments_1))
+    for i, j, x, y, _ in crossings.tolist():
+        si = segments_0[i]
+        sj = segments_1[j]
+        # Build a list of the previous segments for each wire
+        # This will not include the two segments which intersect
+        s0_to_si_minus_1 = segments_0[0:i]
+        s1_to_sj_minus_1 = segments_1[0:j]
+
+        # Build a segment from the start point to the intersection point for both wires
+        s0_sub_segment = WireSegment(
+            x0=si.x0,
+            x1=x,
+            y0=si.y0,
+            y1=y,
+        )
+        s1_sub_segment = WireSegment(
+            x0=sj.x0,
+            x1=x,
+            y0=sj.y0,
+            y1=y,
+        )
+
+        # The WireLoop object is a list of connected WireSegment that eventually loops back to the start.
+        segment_list = s0_to_si_minus_1
+        segment_list.append(s0_sub_segment)
+        segment_list.append(s1_sub_segment)
+        # Reverse the segment list of the second wire
+        segment_list.extend(list(reversed(s1_to_sj_minus_1)))
+        wire_loop = WireLoop(segment_list=segment_list)
+        wire_loop_list.append(wire_loop)
     return wire_loop_list
 
 
@@ -239,6 +753,90 @@ class Day3Tests(unittest.TestCase):
                 WireSegment(x0=0, y0=0, x1=-995, y1=0))
         )
 
+    def test_crossing_segment_pairs(self):
+        segments_0 = self.str_to_segment_list('R8,U5,L5,D3')
+        segments_1 = self.str_to_segment_list('U7,R6,D4,L4')
+        # Compare against checking every pair of segments
+        expected_pairs = [
+            (i, j)
+            for i, s0 in enumerate(segments_0)
+            for j, s1 in enumerate(segments_1)
+            if s0.intersection(other=s1)
+        ]
+        pairs = find_crossing_segment_pairs(segments_0=segments_0, segments_1=segments_1)
+        self.assertEqual(pairs, expected_pairs)
+        self.assertEqual(pairs, [(0, 0), (2, 2), (3, 3)])
+
+    def test_blocked_sorted_list(self):
+        # A small block size splits and removes blocks often
+        blocked_list = _BlockedSortedList(block_size=2)
+        expected = list()
+        rng = np.random.default_rng(26)
+        for value in rng.integers(0, 50, size=300).tolist():
+            if value in expected and value % 3 == 0:
+                blocked_list.remove(value)
+                expected.remove(value)
+            else:
+                blocked_list.add(value)
+                expected.append(value)
+            expected.sort()
+            self.assertEqual([item for block in blocked_list.blocks for item in block], expected)
+            self.assertEqual(list(blocked_list.irange(10, 20)), [item for item in expected if 10 <= item <= 20])
+        self.assertEqual(list(blocked_list.irange(100, 200)), [])
+
+    def test_segment_table(self):
+        table = build_segment_table(self.str_to_segment_list('R8,U5,L5,D3'))
+        self.assertEqual(table['horizontal'].tolist(), [True, False, True, False])
+        self.assertEqual(table['fixed'].tolist(), [0, 8, 5, 3])
+        self.assertEqual(table['lo'].tolist(), [0, 0, 3, 2])
+        self.assertEqual(table['hi'].tolist(), [8, 5, 8, 5])
+        self.assertEqual(table['start'].tolist(), [0, 0, 8, 5])
+        self.assertEqual(table['steps'].tolist(), [0, 8, 13, 18])
+        self.assertEqual(table['steps'].tolist(), [s.steps for s in self.str_to_segment_list('R8,U5,L5,D3')])
+        vector_list = [WireVector.build_from_string(x) for x in 'R8,U5,L5,D3,R0,U0,L2'.split(',')]
+        self.assertEqual(build_segment_table_from_vectors(vector_list).tolist(),
+                         build_segment_table(build_segments_from_vectors(vector_list)).tolist())
+        with self.assertRaises(ValueError):
+            build_segment_table([WireSegment(x0=0, y0=0, x1=1, y1=1)])
+
+        other = build_segment_table(self.str_to_segment_list('U7,R6,D4,L4'))
+        # Segment 'D4' of the second wire crosses 'L5' of the first wire at (6, 5)
+        self.assertEqual(find_crossing_mask(table, other[2]).tolist(), [False, False, True, False])
+
+        crossings = find_table_crossings(table_0=table, table_1=other)
+        self.assertEqual(crossings[['x', 'y']].tolist(), [(0, 0), (6, 5), (3, 3)])
+
+    def test_wire_grid_index(self):
+        wire_list = [
+            'R75,D30,R83,U83,L12,D49,R71,U7,L72',
+            'U62,R66,U55,R34,D71,R55,D58,R83',
+            'R98,U47,R26,D63,R33,U87,L62,D20,R33,U53,R51',
+            'U98,R91,D20,R16,D67,R40,U7,R15,U6,R7',
+            # Vectors with a length of zero never cross another wire
+            'D1,D1,R0,D3,L2,R2,R1,D2,L3,L0',
+            'R0,D3,R1',
+        ]
+        table_list = [build_segment_table(self.str_to_segment_list(x)) for x in wire_list]
+
+        # Compare each pair of wires with the two wire sweep line
+        expected = list()
+        for w0 in range(len(table_list)):
+            for w1 in range(w0 + 1, len(table_list)):
+                crossings = find_table_crossings(table_0=table_list[w0], table_1=table_list[w1])
+                try:
+                    distance, steps = find_closest_distance_and_fewest_steps(crossings)
+                except ValueError:
+                    continue
+                expected.append(WirePairResult(wire_0=w0, wire_1=w1, distance=distance, steps=steps))
+        self.assertIn(WirePairResult(wire_0=0, wire_1=1, distance=159, steps=610), expected)
+        self.assertIn(WirePairResult(wire_0=2, wire_1=3, distance=135, steps=410), expected)
+        self.assertIn(WirePairResult(wire_0=4, wire_1=5, distance=3, steps=6), expected)
+
+        for cell_size in [None, 1, 7, 50, 1000]:
+            grid = WireGridIndex(table_list=table_list, cell_size=cell_size)
+            self.assertEqual(grid.find_wire_pair_results(), expected)
+        self.assertEqual(WireGridIndex(table_list=table_list).find_wire_pair_results(num_workers=2), expected)
+
     @staticmethod
     def str_to_segment_list(vector_list_str: str):
         wire_vector_list = []
@@ -248,6 +846,55 @@ class Day3Tests(unittest.TestCase):
         wire_segment_list = build_segments_from_vectors(wire_vector_list)
         return wire_segment_list
 
+    def test_raster_crossings(self):
+        vector_list_0 = [WireVector.build_from_string(x) for x in 'R8,U5,L5,D3'.split(',')]
+        vector_list_1 = [WireVector.build_from_string(x) for x in 'U7,R6,D4,L4'.split(',')]
+        crossings = find_raster_crossings(vector_list_0=vector_list_0, vector_list_1=vector_list_1)
+        # The wires also cross at the central port like in find_table_crossings
+        self.assertEqual(crossings.tolist(), [(0, 0, 0, 0, 0), (2, 2, 6, 5, 30), (3, 3, 3, 3, 40)])
+
+        # Wires that overlap in the same direction only cross where the other wire turns onto the shared line
+        vector_list_0 = [WireVector.build_from_string(x) for x in 'R5,U2'.split(',')]
+        vector_list_1 = [WireVector.build_from_string(x) for x in 'U1,R3,D1,R4'.split(',')]
+        crossings = find_raster_crossings(vector_list_0=vector_list_0, vector_list_1=vector_list_1)
+        self.assertEqual(crossings[['x', 'y']].tolist(), [(0, 0), (3, 0), (5, 0)])
+
+    def test_wire_crossing_backends_match(self):
+        def check_backends_match(vectors_str_0: str, vectors_str_1: str):
+            vector_list_0 = [WireVector.build_from_string(x) for x in vectors_str_0.split(',')]
+            vector_list_1 = [WireVector.build_from_string(x) for x in vectors_str_1.split(',')]
+            raster_crossings = find_raster_crossings(vector_list_0=vector_list_0, vector_list_1=vector_list_1)
+            table_crossings = find_table_crossings(
+                table_0=build_segment_table(build_segments_from_vectors(vector_list_0)),
+                table_1=build_segment_table(build_segments_from_vectors(vector_list_1)),
+            )
+            self.assertEqual(set(raster_crossings[['x', 'y']].tolist()), set(table_crossings[['x', 'y']].tolist()))
+            if np.any(raster_crossings['x'] != 0) or np.any(raster_crossings['y'] != 0):
+                self.assertEqual(find_closest_distance_and_fewest_steps(raster_crossings),
+                                 find_closest_distance_and_fewest_steps(table_crossings))
+
+        # The wires overlap from (1, 0) to (3, 0) while running in the same direction
+        check_backends_match('R5,U1', 'R3,U1')
+        self.assertEqual(find_closest_distance_and_fewest_steps(find_wire_crossings(
+            vector_list_0=[WireVector.build_from_string(x) for x in 'R5,U1'.split(',')],
+            vector_list_1=[WireVector.build_from_string(x) for x in 'R3,U1'.split(',')],
+        )), (3, 6))
+        # A far away corner makes find_wire_crossings choose the sweep line, which must not change the answer
+        self.assertEqual(find_closest_distance_and_fewest_steps(find_wire_crossings(
+            vector_list_0=[WireVector.build_from_string(x) for x in 'R5,U1,R100000,U100000'.split(',')],
+            vector_list_1=[WireVector.build_from_string(x) for x in 'R3,U1'.split(',')],
+        )), (3, 6))
+
+        # Random wires in a small area overlap and revisit their own points often
+        rng = np.random.default_rng(3)
+        for _ in range(200):
+            vectors_str_0, vectors_str_1 = [
+                ','.join(f'{direction}{length}' for direction, length in zip(
+                    rng.choice(list('UDLR'), size=6).tolist(), rng.integers(0, 4, size=6).tolist()))
+                for _ in range(2)
+            ]
+            check_backends_match(vectors_str_0, vectors_str_1)
+
     def process_example(self, vectors_str_0: str, vectors_str_1: str, expected_distance: int, expected_steps: int):
         """
         :param vectors_str_0: Comma separated vector strings for wire 0
@@ -273,6 +920,18 @@ class Day3Tests(unittest.TestCase):
         shortest_loop = find_shortest_loop(wire_loop_list=wire_loop_list)
         self.assertEqual(shortest_loop.num_steps, expected_steps)
 
+        crossings = find_table_crossings(
+            table_0=build_segment_table(segments_0),
+            table_1=build_segment_table(segments_1),
+        )
+        self.assertEqual(find_closest_distance_and_fewest_steps(crossings), (expected_distance, expected_steps))
+
+        crossings = find_raster_crossings(
+            vector_list_0=[WireVector.build_from_string(x) for x in vectors_str_0.split(',')],
+            vector_list_1=[WireVector.build_from_string(x) for x in vectors_str_1.split(',')],
+        )
+        self.assertEqual(find_closest_distance_and_fewest_steps(crossings), (expected_distance, expected_steps))
+
     def test_example_0(self):
         vectors_str_0 = 'R8,U5,L5,D3'
         vectors_str_1 = 'U7,R6,D4,L4'
@@ -332,37 +991,17 @@ def day_3(txt_path: Path) -> Optional[List[int]]:
     with open(str(txt_path), 'r', newline='') as f:
         row_list = [row for row in f.readlines()]
 
-    multi_wire_segments: List[List[WireSegment]] = list()
+    multi_wire_vectors: List[List[WireVector]] = list()
     for row in row_list:
         wire_vector_list = [WireVector.build_from_string(x) for x in row.split(',')]
-        wire_segment_list = build_segments_from_vectors(wire_vector_list)
-        multi_wire_segments.append(wire_segment_list)
-
-    segments_0 = multi_wire_segments[0]
-    segments_1 = multi_wire_segments[1]
-
-    # Find the intersection points between both wire segments
-    intersections = find_intersection_points(
-        segments_0=segments_0,
-        segments_1=segments_1,
-    )
-
-    # Find the intersection with the smallest Manhattan distance
-    closest_intersection = find_smallest_manhattan_distance(wire_point_list=intersections)
-
-    # Build a loop that connects both wires at the intersection point
-    wire_loop_list = find_intersection_loops(
-        segments_0=segments_0,
-        segments_1=segments_1,
-    )
+        multi_wire_vectors.append(wire_vector_list)
 
-    # Determine which loop has the fewest number of steps
-    shortest_loop = find_shortest_loop(wire_loop_list=wire_loop_list)
+    # Find the intersection points between both wires. Each crossing also knows the combined steps to reach it.
+    crossings = find_wire_crossings(vector_list_0=multi_wire_vectors[0], vector_list_1=multi_wire_vectors[1])
 
     # Part 1: What is the Manhattan distance from the central port to the closest intersection?
-    part_1 = closest_intersection.manhattan_distance
     # Part 2: What is the fewest combined steps the wires must take to reach an intersection?
-    part_2 = shortest_loop.num_steps
+    part_1, part_2 = find_closest_distance_and_fewest_steps(crossings)
     answer = [part_1, part_2]
 
     return answer
@@ -1,8 +1,13 @@
+import math
 import unittest
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple, Iterator, Callable
+
+import numpy as np
 
 
 def is_valid_password_part_1(value: int) -> bool:
@@ -67,16 +72,165 @@ def is_valid_password_part_2(value: int) -> bool:
     return False
 
 
-def find_possible_passwords(value_min: int, value_max: int) -> List[int]:
+def _find_passwords_in_range(value_min: int, value_max: int, is_valid_password: Callable[[int], bool]) -> List[int]:
     valid_passwords = list()
 
     for int_value in range(value_min, value_max + 1):
-        if is_valid_password_part_1(int_value):
+        if is_valid_password(int_value):
             valid_passwords.append(int_value)
 
     return valid_passwords
 
 
+def find_possible_passwords(value_min: int, value_max: int,
+                            is_valid_password: Callable[[int], bool] = is_valid_password_part_1,
+                            num_workers: int = 1) -> List[int]:
+    """ Find every value in the range that is a valid password
+
+    :param value_min: The smallest value in the range
+    :type value_min: int
+    :param value_max: The largest value in the range, inclusive
+    :type value_max: int
+    :param is_valid_password: The rules a password must follow. This must be a module level function when
+        num_workers is more than 1 so it can be sent to the worker processes.
+    :type is_valid_password: Callable[[int], bool]
+    :param num_workers: The number of processes that check the values
+    :type num_workers: int
+    :return: The sorted list of valid passwords
+    :rtype: List[int]
+    """
+    if num_workers <= 1 or value_max <= value_min:
+        return _find_passwords_in_range(value_min=value_min, value_max=value_max, is_valid_password=is_valid_password)
+
+    # Split the range into contiguous sub-ranges. Use a few sub-ranges per worker so the work stays balanced when
+    # some parts of the range are faster to check than others.
+    num_values = value_max - value_min + 1
+    sub_range_size = math.ceil(num_values / (num_workers * 4))
+    sub_range_min_list = list(range(value_min, value_max + 1, sub_range_size))
+    sub_range_max_list = [min(x + sub_range_size - 1, value_max) for x in sub_range_min_list]
+
+    valid_passwords = list()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        # map returns the results in the same order as the sub-ranges
+        for sub_range_passwords in executor.map(_find_passwords_in_range, sub_range_min_list, sub_range_max_list,
+                                                [is_valid_password] * len(sub_range_min_list)):
+            valid_passwords.extend(sub_range_passwords)
+    return valid_passwords
+
+
+def iter_valid_password_chunks(value_min: int, value_max: int, part_2: bool = False,
+                               chunk_size: int = 1000000) -> Iterator[np.ndarray]:
+    """ Find the valid passwords in the range by checking blocks of values at once with NumPy.
+    At most chunk_size values are held in memory at a time.
+
+    :param value_min: The smallest value in the range
+    :type value_min: int
+    :param value_max: The largest value in the range, inclusive
+    :type value_max: int
+    :param part_2: Use the part 2 rules instead of the part 1 rules
+    :type part_2: bool
+    :param chunk_size: The number of values checked in each block
+    :type chunk_size: int
+    :return: Sorted arrays of the valid passwords in each block
+    :rtype: Iterator[np.ndarray]
+    """
+    start = max(value_min, 0)
+    while start <= value_max:
+        # Every value in a block has the same number of digits so leading zeros never form a pair
+        num_digits = len(str(start))
+        stop = min(value_max + 1, start + chunk_size, 10 ** num_digits)
+
+        values = np.arange(start, stop, dtype=np.int64)
+        powers = 10 ** np.arange(num_digits - 1, -1, -1, dtype=np.int64)
+        digits = (values[:, None] // powers) % 10  # One row per value, most significant digit first
+
+        dx = np.diff(digits, axis=1)
+        # Going from left to right, the digits never decrease; they only ever increase or stay the same
+        is_valid = (dx >= 0).all(axis=1)
+        matching = dx == 0
+        if part_2:
+            # A pair of matching digits must not be part of a larger group, so the neighbors of the pair must differ
+            padded = np.pad(matching, ((0, 0), (1, 1)), constant_values=False)
+            exact_pair = padded[:, 1:-1] & ~padded[:, :-2] & ~padded[:, 2:]
+            is_valid &= exact_pair.any(axis=1)
+        else:
+            is_valid &= matching.any(axis=1)
+
+        yield values[is_valid]
+        start = stop
+
+
+def find_possible_passwords_array(value_min: int, value_max: int, part_2: bool = False,
+                                  chunk_size: int = 1000000) -> np.ndarray:
+    """ Same as find_possible_passwords but the passwords are found with NumPy and returned as an array.
+    See iter_valid_password_chunks for the parameters.
+    """
+    chunk_list = list(iter_valid_password_chunks(
+        value_min=value_min, value_max=value_max, part_2=part_2, chunk_size=chunk_size))
+    if not chunk_list:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(chunk_list)
+
+
+def count_valid_passwords(value_min: int, value_max: int) -> Tuple[int, int]:
+    """ Count the passwords in the range that are valid for part 1 and part 2 without checking each value.
+
+    :param value_min: The smallest value in the range
+    :type value_min: int
+    :param value_max: The largest value in the range, inclusive
+    :type value_max: int
+    :return: The number of valid passwords for part 1 and for part 2
+    :rtype: Tuple[int, int]
+    """
+    count_max = _count_valid_passwords_up_to(value=value_max)
+    count_min = _count_valid_passwords_up_to(value=value_min - 1)
+    return count_max[0] - count_min[0], count_max[1] - count_min[1]
+
+
+def _count_valid_passwords_up_to(value: int) -> Tuple[int, int]:
+    """Count the passwords from 1 to value, inclusive, that are valid for part 1 and part 2. """
+    if value <= 0:
+        return 0, 0
+    digits = [int(digit) for digit in str(value)]
+
+    # Build the digits from left to right. Since the digits never decrease, only the previous digit and the length of
+    # the current group of matching digits (1, 2 or 3 for three or more) need to be known to extend a password.
+    # 'tight' is True while every digit so far matches the digits of value, which limits the next digit.
+    # 'started' is False while only leading zeros have been placed, i.e. the password has fewer digits than value.
+    @lru_cache(maxsize=None)
+    def count(i: int, previous: int, group: int, has_pair: bool, has_exact_pair: bool, tight: bool,
+              started: bool) -> Tuple[int, int]:
+        if i == len(digits):
+            if not started:
+                return 0, 0
+            # The last group of matching digits ends with the password
+            return int(has_pair), int(has_exact_pair or group == 2)
+
+        num_part_1 = 0
+        num_part_2 = 0
+        limit = digits[i] if tight else 9
+        for digit in range(limit + 1):
+            next_tight = tight and digit == limit
+            if not started:
+                if digit == 0:
+                    result = count(i + 1, 0, 0, False, False, next_tight, False)
+                else:
+                    result = count(i + 1, digit, 1, False, False, next_tight, True)
+            elif digit < previous:
+                # The digits decreased. This is not a valid password
+                continue
+            elif digit == previous:
+                result = count(i + 1, digit, min(group + 1, 3), True, has_exact_pair, next_tight, True)
+            else:
+                # A new group starts so check if the previous group was exactly a pair
+                result = count(i + 1, digit, 1, has_pair, has_exact_pair or group == 2, next_tight, True)
+            num_part_1 += result[0]
+            num_part_2 += result[1]
+        return num_part_1, num_part_2
+
+    return count(0, 0, 0, False, False, True, False)
+
+
 class Day4Tests(unittest.TestCase):
     def test_part_1_examples(self):
         self.assertEqual(is_valid_password_part_1(111111), True)
@@ -88,6 +242,38 @@ class Day4Tests(unittest.TestCase):
         self.assertEqual(is_valid_password_part_2(123444), False)
         self.assertEqual(is_valid_password_part_2(111122), True)
 
+    def test_find_possible_passwords_array(self):
+        for value_min, value_max in [(0, 0), (0, 1000), (111111, 111111), (99999, 123456)]:
+            value_range = range(value_min, value_max + 1)
+            passwords = find_possible_passwords_array(value_min=value_min, value_max=value_max, chunk_size=1000)
+            self.assertEqual(passwords.tolist(), find_possible_passwords(value_min=value_min, value_max=value_max))
+            passwords = find_possible_passwords_array(
+                value_min=value_min, value_max=value_max, part_2=True, chunk_size=1000)
+            self.assertEqual(passwords.tolist(), [x for x in value_range if is_valid_password_part_2(x)])
+
+    def test_find_possible_passwords_parallel(self):
+        value_min = 99999
+        value_max = 123456
+        for is_valid_password in [is_valid_password_part_1, is_valid_password_part_2]:
+            expected = find_possible_passwords(
+                value_min=value_min, value_max=value_max, is_valid_password=is_valid_password)
+            passwords = find_possible_passwords(
+                value_min=value_min, value_max=value_max, is_valid_password=is_valid_password, num_workers=3)
+            self.assertEqual(passwords, expected)
+
+    def test_count_valid_passwords(self):
+        for value_min, value_max in [(0, 0), (1, 9), (0, 1000), (111111, 111111), (99999, 123456), (12345, 67890)]:
+            value_range = range(value_min, value_max + 1)
+            expected = (
+                sum(1 for x in value_range if is_valid_password_part_1(x)),
+                sum(1 for x in value_range if is_valid_password_part_2(x)),
+            )
+            self.assertEqual(count_valid_passwords(value_min=value_min, value_max=value_max), expected)
+
+        # Every 15 digit password that never decreases must repeat one of the digits 1-9, so part 1 matches all
+        # C(15 + 8, 8) ways to choose the digits.
+        self.assertEqual(count_valid_passwords(value_min=10 ** 14, value_max=10 ** 15 - 1)[0], 490314)
+
 
 def day_4(txt_path: Path) -> List[int]:
     with open(str(txt_path), 'r', newline='') as f:
@@ -98,15 +284,9 @@ def day_4(txt_path: Path) -> List[int]:
     value_max = int(values[1])
 
     # How many different passwords within the range given in your puzzle input meet these criteria?
-    part_1_valid_passwords = list()
-    part_2_valid_passwords = list()
-    for int_value in range(value_min, value_max + 1):
-        if is_valid_password_part_1(int_value):
-            part_1_valid_passwords.append(int_value)
-        if is_valid_password_part_2(int_value):
-            part_2_valid_passwords.append(int_value)
+    part_1_answer, part_2_answer = count_valid_passwords(value_min=value_min, value_max=value_max)
 
-    return [len(part_1_valid_passwords), len(part_2_valid_passwords)]
+    return [part_1_answer, part_2_answer]
 
 
 def main():
@@ -1,8 +1,9 @@
 import unittest
 from pathlib import Path
-from typing import List, Optional, DefaultDict
+from typing import List, Optional, DefaultDict, Dict, Tuple, Iterable
 
-from dataclasses import dataclass, field
+import numpy as np
+from dataclasses import dataclass
 
 
 @dataclass
@@ -12,11 +13,26 @@ class DirectOrbit(object):
     """The m1 object orbits around the m0 object. """
 
 
-@dataclass
 class OrbitalNode(object):
-    name: str
-    parent_orbit: Optional['OrbitalNode'] = None
-    satellites: List['OrbitalNode'] = field(default_factory=list)
+    """A node of the orbit tree. __slots__ is used instead of a dataclass to reduce the memory of large maps. """
+    __slots__ = ('name', 'index', 'parent_orbit', 'satellites')
+
+    def __init__(self, name: str, index: int = -1, parent_orbit: Optional['OrbitalNode'] = None,
+                 satellites: Optional[List['OrbitalNode']] = None):
+        self.name = name
+        self.index = index
+        """The integer id of the node, i.e. the order the name was added to the OrbitalNodeDict. """
+        self.parent_orbit = parent_orbit
+        self.satellites: List['OrbitalNode'] = satellites if satellites is not None else list()
+
+    def __repr__(self):
+        parent_name = self.parent_orbit.name if self.parent_orbit is not None else None
+        return f'{self.__class__.__name__}(name={self.name!r}, index={self.index}, parent_orbit={parent_name!r})'
+
+
+class NodeNotFoundError(ValueError):
+    """Exception that is thrown if a specified OrbitalNode could not be found."""
+    pass
 
 
 class OrbitalNodeDict(DefaultDict[str, OrbitalNode]):
@@ -24,12 +40,38 @@ class OrbitalNodeDict(DefaultDict[str, OrbitalNode]):
     Note: typing.DefaultDict was used instead of collections.defaultdict so type hinting can be implemented.
     """
 
+    def __init__(self):
+        super().__init__()
+        self.root_dict: Dict[str, OrbitalNode] = dict()
+        """The nodes that do not orbit anything, in the order they were added. """
+
     def __missing__(self, key):
-        node = OrbitalNode(name=key)
+        node = OrbitalNode(name=key, index=len(self))
         self[key] = node  # Make sure the OrbitalNode object is added to this dictionary for future use.
+        self.root_dict[key] = node  # A new node does not orbit anything until add_orbit is called
+        return node
+
+    def add_orbit(self, orbit: DirectOrbit):
+        """Link the two nodes of the DirectOrbit, creating the nodes if necessary. """
+        node0 = self[orbit.m0]
+        node1 = self[orbit.m1]
+        # Assign node1 as a satellite of node0
+        node0.satellites.append(node1)
+        # Assign node0 as the parent of node1
+        node1.parent_orbit = node0
+        self.root_dict.pop(orbit.m1, None)
+
+    def find_node(self, name: str) -> OrbitalNode:
+        """Get the node with the name without creating it. Raise NodeNotFoundError if the name is unknown. """
+        node = self.get(name)
+        if node is None:
+            raise NodeNotFoundError(f'No OrbitalNode with the name {name!r}')
         return node
 
     def get_root_node(self) -> OrbitalNode:
+        if len(self.root_dict) == 1:
+            return next(iter(self.root_dict.values()))
+        # There are several separate trees, so return the root of the first node that was added
         for orbital_node in self.values():
             while orbital_node.parent_orbit is not None:
                 orbital_node = orbital_node.parent_orbit
@@ -50,12 +92,7 @@ def build_orbital_node_dict(orbit_list: List[DirectOrbit]) -> OrbitalNodeDict:
     # Use the defaultdict to create an empty OrbitalNode if it does not exist.
     node_dict = OrbitalNodeDict()
     for orbit in orbit_list:
-        node0 = node_dict[orbit.m0]
-        node1 = node_dict[orbit.m1]
-        # Assign node1 as a satellite of node0
-        node0.satellites.append(node1)
-        # Assign node0 as the parent of node1
-        node1.parent_orbit = node0
+        node_dict.add_orbit(orbit=orbit)
 
     return node_dict
 
@@ -68,26 +105,75 @@ def count_direct_and_indirect_orbits(root_node: OrbitalNode) -> int:
     :return: The number of direct and indirect orbits
     :rtype: int
     """
-    num_orbits = 0
-    # Count the number of direct and indirect orbits by counting the number of hops until the Center of Mass (COM),
-    # is reached, i.e. when the parent_orbit is None.
+    # Count the number of direct and indirect orbits of the root node by counting the number of hops until the
+    # Center of Mass (COM), is reached, i.e. when the parent_orbit is None.
+    root_depth = 0
     parent_node = root_node.parent_orbit
     while parent_node is not None:
-        num_orbits += 1
+        root_depth += 1
         parent_node = parent_node.parent_orbit
 
-    # Use recursion to count the orbits for each satellite
-    for satellite in root_node.satellites:
-        num_orbits += count_direct_and_indirect_orbits(root_node=satellite)
+    # Each satellite has one more orbit than its parent. Use a stack instead of recursion so long chains of
+    # satellites do not reach the recursion limit.
+    num_orbits = 0
+    stack = [(root_node, root_depth)]
+    while stack:
+        node, depth = stack.pop()
+        num_orbits += depth
+        for satellite in node.satellites:
+            stack.append((satellite, depth + 1))
     return num_orbits
 
 
-class NodeNotFoundError(ValueError):
-    """Exception that is thrown if a specified OrbitalNode could not be found."""
-    pass
+@dataclass
+class OrbitArrays(object):
+    """The orbit tree stored as arrays where each object is represented by an integer index. """
+    name_list: List[str]
+    """The name of the object at each index. """
+    parent: np.ndarray
+    """The index of the object each object orbits, or -1 if the object does not orbit anything. """
+    order: np.ndarray
+    """The index of every object in breadth first order, so every object comes after the object it orbits. """
+    depth: np.ndarray
+    """The number of direct and indirect orbits of each object. """
+
+    @property
+    def num_orbits(self) -> int:
+        """The total number of direct and indirect orbits. """
+        return int(self.depth.sum())
+
+    @classmethod
+    def build_from_orbital_node_dict(cls, node_dict: OrbitalNodeDict) -> 'OrbitArrays':
+        # The index of each node is the position of the node in the dictionary
+        name_list = list(node_dict.keys())
+
+        parent_list = [-1] * len(name_list)
+        satellite_list: List[List[int]] = [list() for _ in name_list]
+        for node in node_dict.values():
+            if node.parent_orbit is not None:
+                parent_list[node.index] = node.parent_orbit.index
+            satellite_list[node.index] = [satellite.index for satellite in node.satellites]
+
+        # Breadth first search from every object that does not orbit anything
+        order_list = [node.index for node in node_dict.root_dict.values()]
+        for i in order_list:  # The list grows while it is iterated
+            order_list.extend(satellite_list[i])
+
+        # Parents come first in the order, so their depth is always known before their satellites
+        depth_list = [0] * len(name_list)
+        for i in order_list:
+            parent = parent_list[i]
+            if parent != -1:
+                depth_list[i] = depth_list[parent] + 1
+
+        return OrbitArrays(
+            name_list=name_list,
+            parent=np.array(parent_list, dtype=np.int64),
+            order=np.array(order_list, dtype=np.int64),
+            depth=np.array(depth_list, dtype=np.int64),
+        )
 
 
-# TODO: Share the OrbitalNodeDict so this function is not necessary
 def find_specific_node(node_name: str, root_node: OrbitalNode) -> OrbitalNode:
     """ Search for the OrbitalNode with the matching name
 
@@ -97,14 +183,14 @@ def find_specific_node(node_name: str, root_node: OrbitalNode) -> OrbitalNode:
     :type root_node: OrbitalNode
     :return: The OrbitalNode with the matching name
     """
-    if root_node.name == node_name:
-        return root_node
-    for satellite in root_node.satellites:
-        try:
-            return find_specific_node(node_name=node_name, root_node=satellite)
-        except NodeNotFoundError:
-            pass
-    raise NodeNotFoundError
+    # Note: OrbitalNodeDict.find_node is a single dictionary lookup and should be used when the dictionary is available
+    stack = [root_node]
+    while stack:
+        node = stack.pop()
+        if node.name == node_name:
+            return node
+        stack.extend(node.satellites)
+    raise NodeNotFoundError(f'No OrbitalNode with the name {node_name!r}')
 
 
 def find_num_orbital_transfers(node0: OrbitalNode, node1: OrbitalNode) -> int:
@@ -149,6 +235,159 @@ def find_num_orbital_transfers(node0: OrbitalNode, node1: OrbitalNode) -> int:
     return num_hop
 
 
+class OrbitTransferIndex(object):
+    """Precomputed ancestor tables that answer orbital transfer queries on the same map in O(log n) each.
+
+    ancestors[k][i] is the object 2**k orbits above object i, using binary lifting to find the lowest common
+    ancestor of two objects. Objects that do not orbit anything are their own ancestor.
+    """
+
+    def __init__(self, orbit_arrays: OrbitArrays):
+        self.orbit_arrays = orbit_arrays
+        self.index_dict: Dict[str, int] = {name: i for i, name in enumerate(orbit_arrays.name_list)}
+
+        parent = orbit_arrays.parent
+        ancestor = np.where(parent == -1, np.arange(len(parent)), parent)
+        self.ancestors: List[np.ndarray] = [ancestor]
+        max_depth = int(orbit_arrays.depth.max()) if len(parent) else 0
+        for _ in range(1, max(1, max_depth.bit_length())):
+            ancestor = ancestor[ancestor]
+            self.ancestors.append(ancestor)
+
+    def find_common_ancestors(self, index_0: np.ndarray, index_1: np.ndarray) -> np.ndarray:
+        """ Find the lowest common ancestor of each pair of objects
+
+        :param index_0: Array of object indexes
+        :type index_0: np.ndarray
+        :param index_1: Array of object indexes with the same shape as index_0
+        :type index_1: np.ndarray
+        :return: The index of the lowest common ancestor of each pair
+        :rtype: np.ndarray
+        """
+        depth = self.orbit_arrays.depth
+        # Make index_0 the deeper object of each pair
+        swap = depth[index_0] < depth[index_1]
+        index_0, index_1 = np.where(swap, index_1, index_0), np.where(swap, index_0, index_1)
+
+        # Move the deeper object up until both objects have the same depth
+        depth_difference = depth[index_0] - depth[index_1]
+        for k, ancestor in enumerate(self.ancestors):
+            index_0 = np.where((depth_difference >> k) & 1 == 1, ancestor[index_0], index_0)
+
+        # Move both objects up by the largest jumps that keep them apart, which stops right below the common ancestor
+        for ancestor in reversed(self.ancestors):
+            ancestor_0 = ancestor[index_0]
+            ancestor_1 = ancestor[index_1]
+            is_apart = ancestor_0 != ancestor_1
+            index_0 = np.where(is_apart, ancestor_0, index_0)
+            index_1 = np.where(is_apart, ancestor_1, index_1)
+
+        common = np.where(index_0 == index_1, index_0, self.ancestors[0][index_0])
+        if np.any(common != np.where(index_0 == index_1, index_1, self.ancestors[0][index_1])):
+            raise ValueError('Objects that do not orbit the same Center of Mass (COM) have no common ancestor')
+        return common
+
+    def count_orbital_transfers_batch(self, pair_list: List[Tuple[str, str]]) -> np.ndarray:
+        """ Same as find_num_orbital_transfers for many pairs of object names at once
+
+        :param pair_list: List of (name0, name1) where name0 would be moved into orbit around the parent of name1
+        :type pair_list: List[Tuple[str, str]]
+        :return: The number of orbital transfers for each pair
+        :rtype: np.ndarray
+        """
+        index_0 = np.array([self.index_dict[name0] for name0, _ in pair_list], dtype=np.int64)
+        index_1 = np.array([self.index_dict[name1] for _, name1 in pair_list], dtype=np.int64)
+        common = self.find_common_ancestors(index_0=index_0, index_1=index_1)
+        depth = self.orbit_arrays.depth
+        # Both objects move to the common ancestor, excluding the hops out of node0 and node1 themselves
+        return depth[index_0] + depth[index_1] - 2 * depth[common] - 2
+
+    def count_orbital_transfers(self, name0: str, name1: str) -> int:
+        return int(self.count_orbital_transfers_batch(pair_list=[(name0, name1)])[0])
+
+
+class IncrementalOrbitGraph(object):
+    """Orbit map that accepts DirectOrbit one at a time, in any order, and keeps the total number of direct and
+    indirect orbits up to date as each orbit is added.
+
+    The objects are grouped with a union-find structure where every group is one tree of the map and the group
+    representative is the object at the root of the tree. Each object stores its depth relative to the object it
+    links to, so the depth of any object is the sum of the depths along its links, which path compression keeps short.
+    """
+
+    def __init__(self):
+        self.index_dict: Dict[str, int] = dict()
+        self.num_orbits = 0
+        """The total number of direct and indirect orbits of every object added so far. """
+        self._link: List[int] = list()
+        self._depth_offset: List[int] = list()
+        self._tree_size: List[int] = list()  # Only valid for the root of each tree
+        self._has_parent: List[bool] = list()
+
+    def _get_index(self, name: str) -> int:
+        index = self.index_dict.get(name)
+        if index is None:
+            index = len(self.index_dict)
+            self.index_dict[name] = index
+            self._link.append(index)
+            self._depth_offset.append(0)
+            self._tree_size.append(1)
+            self._has_parent.append(False)
+        return index
+
+    def _find_root(self, index: int) -> Tuple[int, int]:
+        """Find the root of the tree that contains the object and the depth of the object below the root. """
+        path = list()
+        while self._link[index] != index:
+            path.append(index)
+            index = self._link[index]
+        root = index
+
+        # Link every object on the path directly to the root, starting with the object closest to the root
+        depth = 0
+        for index in reversed(path):
+            depth += self._depth_offset[index]
+            self._depth_offset[index] = depth
+            self._link[index] = root
+        return root, depth
+
+    def add_orbit(self, orbit: DirectOrbit):
+        parent = self._get_index(orbit.m0)
+        satellite = self._get_index(orbit.m1)
+        if self._has_parent[satellite]:
+            raise ValueError(f'{orbit.m1} already orbits another object. Orbit: {orbit}')
+        parent_root, parent_depth = self._find_root(parent)
+        if parent_root == satellite:
+            raise ValueError(f'{orbit.m0} already orbits {orbit.m1}, adding {orbit} would create a loop')
+
+        # The satellite is the root of its own tree. Every object in that tree gains the depth of the satellite.
+        self._has_parent[satellite] = True
+        self._link[satellite] = parent_root
+        self._depth_offset[satellite] = parent_depth + 1
+        self.num_orbits += self._tree_size[satellite] * (parent_depth + 1)
+        self._tree_size[parent_root] += self._tree_size[satellite]
+
+    def add_orbits(self, orbit_iter: Iterable[DirectOrbit]):
+        for orbit in orbit_iter:
+            self.add_orbit(orbit=orbit)
+
+    def get_num_orbits(self, name: str) -> int:
+        """The number of direct and indirect orbits of a single object based on the orbits added so far. """
+        _, depth = self._find_root(self.index_dict[name])
+        return depth
+
+
+def parse_direct_orbit(line: str) -> DirectOrbit:
+    # Trim the newline characters: \r\n
+    line = line.strip()
+    # Example: '6WF)DRK' where '6WF' is m0, and 'DRK' is m1
+    obj_iter = iter(line.split(')'))
+    return DirectOrbit(
+        m0=next(obj_iter),
+        m1=next(obj_iter),
+    )
+
+
 class Day6Tests(unittest.TestCase):
     def test_part_1_example(self):
         #         G - H       J - K - L
@@ -171,6 +410,23 @@ class Day6Tests(unittest.TestCase):
         num_orbits = count_direct_and_indirect_orbits(root_node=root_orbital_node)
         self.assertEqual(num_orbits, expected_num_orbits)
 
+        orbit_arrays = OrbitArrays.build_from_orbital_node_dict(node_dict=orbital_node_dict)
+        self.assertEqual(orbit_arrays.num_orbits, expected_num_orbits)
+        self.assertEqual(orbit_arrays.name_list[orbit_arrays.order[0]], 'COM')
+        self.assertEqual(orbit_arrays.depth[orbit_arrays.name_list.index('L')], 7)
+
+    def test_long_orbit_chain(self):
+        # A single chain that is much deeper than the recursion limit
+        num_objects = 20000
+        orbits = [DirectOrbit(m0=str(i), m1=str(i + 1)) for i in range(num_objects - 1)]
+        orbital_node_dict = build_orbital_node_dict(orbit_list=orbits)
+        expected_num_orbits = num_objects * (num_objects - 1) // 2
+
+        root_node = orbital_node_dict.get_root_node()
+        self.assertEqual(count_direct_and_indirect_orbits(root_node=root_node), expected_num_orbits)
+        orbit_arrays = OrbitArrays.build_from_orbital_node_dict(node_dict=orbital_node_dict)
+        self.assertEqual(orbit_arrays.num_orbits, expected_num_orbits)
+
     def test_part_2_example(self):
         #                           YOU
         #                          /
@@ -184,6 +440,13 @@ class Day6Tests(unittest.TestCase):
         orbits = self.build_direct_orbit_list(map_list=map_list)
         orbital_node_dict = build_orbital_node_dict(orbit_list=orbits)
 
+        self.assertIs(find_specific_node(node_name='YOU', root_node=orbital_node_dict.get_root_node()),
+                      orbital_node_dict.find_node('YOU'))
+        with self.assertRaises(NodeNotFoundError):
+            orbital_node_dict.find_node('UNKNOWN')
+        with self.assertRaises(NodeNotFoundError):
+            find_specific_node(node_name='UNKNOWN', root_node=orbital_node_dict.get_root_node())
+
         # Find the node with the name 'YOU'
         you_node = orbital_node_dict['YOU']
         self.assertEqual(you_node.name, 'YOU')
@@ -197,49 +460,62 @@ class Day6Tests(unittest.TestCase):
         num_transfers = find_num_orbital_transfers(node0=you_node, node1=santa_node)
         self.assertEqual(num_transfers, expected_num_transfers)
 
+        transfer_index = OrbitTransferIndex(OrbitArrays.build_from_orbital_node_dict(node_dict=orbital_node_dict))
+        self.assertEqual(transfer_index.count_orbital_transfers('YOU', 'SAN'), expected_num_transfers)
+
+        # Compare every pair of objects against the parent list search
+        pair_list = [(name0, name1) for name0 in orbital_node_dict for name1 in orbital_node_dict]
+        expected = [
+            find_num_orbital_transfers(node0=orbital_node_dict[name0], node1=orbital_node_dict[name1])
+            for name0, name1 in pair_list
+        ]
+        self.assertEqual(transfer_index.count_orbital_transfers_batch(pair_list=pair_list).tolist(), expected)
+
+    def test_incremental_orbit_graph(self):
+        map_list = ['COM)B', 'B)C', 'C)D', 'D)E', 'E)F', 'B)G', 'G)H', 'D)I', 'E)J', 'J)K', 'K)L']
+        orbits = self.build_direct_orbit_list(map_list=map_list)
+
+        # The total must match a full recount after every orbit, regardless of the order the orbits arrive in
+        for orbit_order in [orbits, list(reversed(orbits)), orbits[5:] + orbits[:5]]:
+            orbit_graph = IncrementalOrbitGraph()
+            for i, orbit in enumerate(orbit_order):
+                orbit_graph.add_orbit(orbit=orbit)
+                orbital_node_dict = build_orbital_node_dict(orbit_list=orbit_order[:i + 1])
+                orbit_arrays = OrbitArrays.build_from_orbital_node_dict(node_dict=orbital_node_dict)
+                self.assertEqual(orbit_graph.num_orbits, orbit_arrays.num_orbits)
+            self.assertEqual(orbit_graph.num_orbits, 42)
+            self.assertEqual(orbit_graph.get_num_orbits('L'), 7)
+
+        with self.assertRaises(ValueError):
+            orbit_graph.add_orbit(DirectOrbit(m0='G', m1='L'))
+        with self.assertRaises(ValueError):
+            orbit_graph.add_orbit(DirectOrbit(m0='L', m1='COM'))
+
     @staticmethod
     def build_direct_orbit_list(map_list: List[str]) -> List[DirectOrbit]:
-        orbits: List[DirectOrbit] = list()
-        for line in map_list:
-            # Example: '6WF)DRK' where '6WF' is m0, and 'DRK' is m1
-            obj_iter = iter(line.split(')'))
-            direct_orbit = DirectOrbit(
-                m0=next(obj_iter),
-                m1=next(obj_iter),
-            )
-            orbits.append(direct_orbit)
-        return orbits
+        return [parse_direct_orbit(line) for line in map_list]
 
 
 def day_6(txt_path: Path) -> List[int]:
-    # Load puzzle input as List[DirectOrbit]
-    orbits: List[DirectOrbit] = list()
+    # Read the puzzle input one DirectOrbit at a time and add it to both the OrbitalNode tree and the orbit graph
+    orbital_node_dict = OrbitalNodeDict()
+    orbit_graph = IncrementalOrbitGraph()
     with open(str(txt_path), mode='r', newline='') as f:
-        for line in f.readlines():
-            # Trim the newline characters: \r\n
-            line = line.strip()
-            # Example: '6WF)DRK' where '6WF' is m0, and 'DRK' is m1
-            obj_iter = iter(line.split(')'))
-            direct_orbit = DirectOrbit(
-                m0=next(obj_iter),
-                m1=next(obj_iter),
-            )
-            orbits.append(direct_orbit)
-
-    # Build a OrbitalNode tree and get the node that represents the Center of Mass (COM)
-    orbital_node_dict = build_orbital_node_dict(orbit_list=orbits)
+        for line in f:
+            direct_orbit = parse_direct_orbit(line)
+            orbital_node_dict.add_orbit(orbit=direct_orbit)
+            orbit_graph.add_orbit(orbit=direct_orbit)
 
     # Part 1: What is the total number of direct and indirect orbits in your map data?
-    root_node = orbital_node_dict.get_root_node()
-    part_1_answer = count_direct_and_indirect_orbits(root_node=root_node)
+    part_1_answer = orbit_graph.num_orbits
 
     # Part 2: What is the minimum number of orbital transfers required to move from the object YOU are orbiting to
     # the object SAN is orbiting? (Between the objects they are orbiting - not between YOU and SAN.)
 
-    # Find the node with the name 'YOU' and 'SAN' and calculate the number of orbital transfers
-    you_node = orbital_node_dict['YOU']
-    santa_node = orbital_node_dict['SAN']
-    part_2_answer = find_num_orbital_transfers(node0=you_node, node1=santa_node)
+    orbit_arrays = OrbitArrays.build_from_orbital_node_dict(node_dict=orbital_node_dict)
+    # Find the common ancestor of 'YOU' and 'SAN' and calculate the number of orbital transfers
+    transfer_index = OrbitTransferIndex(orbit_arrays=orbit_arrays)
+    part_2_answer = transfer_index.count_orbital_transfers(name0='YOU', name1='SAN')
 
     return [part_1_answer, part_2_answer]
 
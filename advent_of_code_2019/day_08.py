@@ -1,12 +1,13 @@
+import tempfile
 import unittest
-from collections import Counter
 from enum import IntEnum
 from pathlib import Path
-from typing import Optional
 
 import numpy as np
 from dataclasses import dataclass
 
+from advent_of_code_2019.glyph_ocr import LETTER_GLYPHS, UnknownGlyphError, read_glyphs
+
 
 class PixelColor(IntEnum):
     BLACK = 0
@@ -19,18 +20,117 @@ class DecodedImage(object):
     image_data: np.ndarray
 
     def render(self) -> np.ndarray:
-        num_layers, num_row, num_col = self.image_data.shape
-        final_render = np.zeros(shape=(num_row, num_col), dtype=np.int)
-
-        for col_i in range(num_col):
-            for row_i in range(num_row):
-                for layer_i in range(num_layers):
-                    pixel = self.image_data[layer_i, row_i, col_i]
-                    if pixel != PixelColor.TRANSPARENT:
-                        # First non-transparent color
-                        final_render[row_i, col_i] = pixel
-                        # Additional layers will be occluded and can be skipped.
-                        break
+        final_render = composite_layers(layers=self.image_data)
+        # Pixels that are transparent in every layer are left black
+        final_render[final_render == PixelColor.TRANSPARENT] = PixelColor.BLACK
+        return final_render
+
+
+def composite_layers(layers: np.ndarray) -> np.ndarray:
+    """ Stack the layers so the first layer is in front and the last layer is in back
+
+    :param layers: The pixel values with the shape (layers, rows, cols)
+    :type layers: np.ndarray
+    :return: The first non-transparent color of each pixel, or transparent if every layer is transparent
+    :rtype: np.ndarray
+    """
+    is_opaque = layers != PixelColor.TRANSPARENT
+    # argmax returns the first True along the layer axis, i.e. the first non-transparent color of each pixel.
+    # Additional layers are occluded.
+    first_opaque_layer = is_opaque.argmax(axis=0)
+    final_render = np.take_along_axis(layers, first_opaque_layer[np.newaxis], axis=0)[0]
+    return np.where(is_opaque.any(axis=0), final_render, PixelColor.TRANSPARENT).astype(np.uint8)
+
+
+def count_layer_colors(layers: np.ndarray, num_colors: int = 10) -> np.ndarray:
+    """ Count the number of pixels of each color in every layer
+
+    :param layers: The pixel values with the shape (layers, rows, cols)
+    :type layers: np.ndarray
+    :param num_colors: The number of possible pixel values. Every pixel must be less than this value.
+    :type num_colors: int
+    :return: The counts with the shape (layers, num_colors)
+    :rtype: np.ndarray
+    """
+    num_layers = len(layers)
+    pixels = layers.reshape(num_layers, -1).astype(np.int64)
+    if pixels.size and pixels.max() >= num_colors:
+        raise ValueError(f'The layers contain a pixel value of {pixels.max()} which is not less than {num_colors}')
+    # Offset the values of each layer so a single bincount counts every layer separately
+    offsets = np.arange(num_layers, dtype=np.int64)[:, np.newaxis] * num_colors
+    counts = np.bincount((pixels + offsets).ravel(), minlength=num_layers * num_colors)
+    return counts.reshape(num_layers, num_colors)
+
+
+def calculate_checksum(color_counts: np.ndarray) -> int:
+    """ Find the layer that contains the fewest 0 digits. On that layer, multiply the number of 1 digits by the number
+    of 2 digits. The first layer is used if several layers have the same number of 0 digits.
+
+    :param color_counts: The number of pixels of each color with the shape (layers, colors), see count_layer_colors
+    :type color_counts: np.ndarray
+    :return: The checksum
+    :rtype: int
+    """
+    layer_index = color_counts[:, PixelColor.BLACK].argmin()
+    return int(color_counts[layer_index, PixelColor.WHITE] * color_counts[layer_index, PixelColor.TRANSPARENT])
+
+
+class MappedImage(object):
+    """Space Image Format file that is memory-mapped instead of loaded, so large transmissions can be processed
+    a few layers at a time. The file must hold one line of digits, optionally followed by whitespace.
+    """
+
+    def __init__(self, txt_path: Path, num_row: int, num_col: int):
+        self.num_row = num_row
+        self.num_col = num_col
+
+        file_data = np.memmap(str(txt_path), dtype=np.uint8, mode='r')
+        # Ignore the newline characters or spaces at the end of the file
+        data_size = len(file_data)
+        while data_size > 0 and file_data[data_size - 1] in b' \t\r\n':
+            data_size -= 1
+
+        layer_size = num_row * num_col
+        if data_size == 0 or data_size % layer_size != 0:
+            raise ValueError(f'The image data in {txt_path} is not divisible by the specified number of rows and '
+                             f'columns. num_row: {num_row}, num_col: {num_col}, data size: {data_size}')
+        self.num_layers = data_size // layer_size
+        self.raw_layers: np.ndarray = file_data[:data_size].reshape((self.num_layers, num_row, num_col))
+        """View of the file with the shape (layers, rows, cols). The values are the ASCII codes of the digits. """
+
+    def get_layers(self, start: int, stop: int) -> np.ndarray:
+        """Read and decode the layers from start to stop, with the shape (stop - start, rows, cols). """
+        # Convert the ASCII digits to their values. Characters before '0' wrap around to large values.
+        layers = self.raw_layers[start:stop] - np.uint8(ord('0'))
+        if np.any(layers > 9):
+            raise ValueError(f'The image data in layers {start} to {stop} contains characters that are not digits')
+        return layers
+
+    def count_layer_colors(self, num_colors: int = 10, chunk_size: int = 1024) -> np.ndarray:
+        """ Same as count_layer_colors but only chunk_size layers are read at a time
+
+        :return: The counts with the shape (layers, num_colors)
+        :rtype: np.ndarray
+        """
+        counts = np.zeros((self.num_layers, num_colors), dtype=np.int64)
+        for start in range(0, self.num_layers, chunk_size):
+            stop = min(start + chunk_size, self.num_layers)
+            counts[start:stop] = count_layer_colors(layers=self.get_layers(start, stop), num_colors=num_colors)
+        return counts
+
+    def render(self, chunk_size: int = 1024) -> np.ndarray:
+        """ Same as DecodedImage.render but the layers are stacked chunk_size layers at a time, from front to back.
+        The remaining layers are skipped once every pixel has a color.
+        """
+        final_render = np.full((self.num_row, self.num_col), PixelColor.TRANSPARENT, dtype=np.uint8)
+        for start in range(0, self.num_layers, chunk_size):
+            chunk_render = composite_layers(layers=self.get_layers(start, start + chunk_size))
+            is_transparent = final_render == PixelColor.TRANSPARENT
+            final_render[is_transparent] = chunk_render[is_transparent]
+            if not np.any(final_render == PixelColor.TRANSPARENT):
+                break
+        # Pixels that are transparent in every layer are left black
+        final_render[final_render == PixelColor.TRANSPARENT] = PixelColor.BLACK
         return final_render
 
 
@@ -50,21 +150,11 @@ def decode_image_from_digital_sending_network(data: str, num_row: int, num_col:
                          f' num_row: {num_row}, num_col: {num_col}, len(data): {len(data)}, layers: {num_layers}')
 
     num_layers = int(num_layers)
-    image_data = np.zeros(shape=(num_layers, num_row, num_col), dtype=np.int)
-
-    row_index = 0
-    col_index = 0
-    layer_index = 0
-
-    for pixel_str in data:
-        image_data[layer_index, row_index, col_index] = int(pixel_str)
-        col_index += 1
-        if col_index >= num_col:
-            col_index = 0
-            row_index += 1
-        if row_index >= num_row:
-            row_index = 0
-            layer_index += 1
+    # Convert the ASCII digits to their values. Characters before '0' wrap around to large values.
+    pixels = np.frombuffer(data.encode(), dtype=np.uint8) - ord('0')
+    if pixels.size != len(data) or np.any(pixels > 9):
+        raise ValueError(f'The provided image data contains characters that are not digits. len(data): {len(data)}')
+    image_data = pixels.reshape((num_layers, num_row, num_col))
     return DecodedImage(image_data=image_data)
 
 
@@ -92,6 +182,20 @@ class Day8Tests(unittest.TestCase):
         self.assertListEqual(actual_data, expected_data)
         self.assertListEqual(list(decoded_image.image_data[0].tolist()), expected_data[0])
 
+    def test_calculate_checksum(self):
+        decoded_image = decode_image_from_digital_sending_network(data='123456789012', num_row=2, num_col=3)
+        color_counts = count_layer_colors(layers=decoded_image.image_data)
+        self.assertEqual(color_counts.shape, (2, 10))
+        self.assertListEqual(color_counts[0].tolist(), [0, 1, 1, 1, 1, 1, 1, 0, 0, 0])
+        self.assertEqual(calculate_checksum(color_counts=color_counts), 1)
+        with self.assertRaises(ValueError):
+            count_layer_colors(layers=decoded_image.image_data, num_colors=3)
+
+        decoded_image = decode_image_from_digital_sending_network(data='0222112222120000', num_row=2, num_col=2)
+        color_counts = count_layer_colors(layers=decoded_image.image_data, num_colors=3)
+        # Layers 1 and 2 have no 0 digits, the first of the two is used
+        self.assertEqual(calculate_checksum(color_counts=color_counts), 4)
+
     def test_part_2_example_1(self):
         data = '0222112222120000'
         num_row = 2
@@ -104,6 +208,52 @@ class Day8Tests(unittest.TestCase):
         actual_render = decoded_image.render().tolist()
         assert isinstance(actual_render, list)
         self.assertListEqual(actual_render, expected_render)
+        self.assertEqual(decoded_image.image_data.dtype, np.uint8)
+
+        with self.assertRaises(ValueError):
+            decode_image_from_digital_sending_network(data='02221122221200a0', num_row=num_row, num_col=num_col)
+
+    def test_read_glyphs(self):
+        # Each letter is drawn in a 5 column cell like the 25x6 puzzle image, so 'Y' touches the next letter
+        message = 'JYZYY'
+        row_list = [''.join(LETTER_GLYPHS[letter][row_i].ljust(5, '.') for letter in message) for row_i in range(6)]
+        # Cover the message with a transparent layer and hide a white pixel behind the black background
+        data = '2' * 150 + ''.join(row.replace('.', '0').replace('#', '1') for row in row_list) + '1' * 150
+        decoded_image = decode_image_from_digital_sending_network(data=data, num_row=6, num_col=25)
+        image = decoded_image.render()
+        self.assertEqual(read_glyphs(image=image == PixelColor.WHITE), message)
+
+        image[2, 24] = PixelColor.WHITE
+        with self.assertRaises(UnknownGlyphError):
+            read_glyphs(image=image == PixelColor.WHITE)
+
+    def test_mapped_image(self):
+        data = '0222112222120000'
+        num_row = 2
+        num_col = 2
+        decoded_image = decode_image_from_digital_sending_network(data=data, num_row=num_row, num_col=num_col)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            txt_path = Path(tmp_dir, 'image.txt')
+            with open(str(txt_path), mode='w', newline='') as f:
+                f.write(data + '\r\n')
+            mapped_image = MappedImage(txt_path=txt_path, num_row=num_row, num_col=num_col)
+            self.assertEqual(mapped_image.num_layers, 4)
+            self.assertListEqual(mapped_image.get_layers(0, 4).tolist(), decoded_image.image_data.tolist())
+            for chunk_size in [1, 3, 4]:
+                self.assertListEqual(mapped_image.render(chunk_size=chunk_size).tolist(),
+                                     decoded_image.render().tolist())
+                self.assertListEqual(mapped_image.count_layer_colors(num_colors=3, chunk_size=chunk_size).tolist(),
+                                     [[1, 0, 3], [0, 2, 2], [0, 1, 3], [4, 0, 0]])
+            del mapped_image  # Release the memory map so the file can be removed
+
+            # Decoding the layers fails like decode_image_from_digital_sending_network
+            with open(str(txt_path), mode='w', newline='') as f:
+                f.write('02221122221200a0')
+            mapped_image = MappedImage(txt_path=txt_path, num_row=num_row, num_col=num_col)
+            with self.assertRaises(ValueError):
+                mapped_image.render()
+            del mapped_image
 
 
 def day_8(txt_path: Path) -> list:
@@ -123,31 +273,15 @@ def day_8(txt_path: Path) -> list:
 
     # To make sure the image wasn't corrupted during transmission, the Elves would like you to find the layer that
     # contains the fewest 0 digits. On that layer, what is the number of 1 digits multiplied by the number of 2 digits?
-
-    fewest_num_zero_layer_counter: Optional[Counter] = None
-    fewest_num_zero_found = 0  # Number of zeros found in the layer with the fewest number of zeros
-
-    num_layers, num_row, num_col = decoded_image.image_data.shape
-    for layer_index in range(num_layers):
-        layer: np.ndarray = decoded_image.image_data[layer_index]
-        # Build a Counter object to build a dictionary to store the number of occurrences for each pixel value.
-        pixels = layer.flatten()  # 2D to 1D array, order does not matter.
-        counter = Counter(pixels)
-        num_zeros_found = counter[0]
-
-        if fewest_num_zero_layer_counter is None or num_zeros_found < fewest_num_zero_found:
-            fewest_num_zero_layer_counter = counter
-            fewest_num_zero_found = num_zeros_found
+    color_counts = count_layer_colors(layers=decoded_image.image_data, num_colors=len(PixelColor))
 
     # Part 1: What is the number of 1 digits multiplied by the number of 2 digits?
-    part_1_answer = fewest_num_zero_layer_counter[1] * fewest_num_zero_layer_counter[2]
+    part_1_answer = calculate_checksum(color_counts=color_counts)
 
     image = decoded_image.render()
 
     # Part 2: What message is produced after decoding your image?
-    print(image)
-    # TODO: Convert a 6x5 binary image of an upper case letter into a string
-    part_2_answer = None
+    part_2_answer = read_glyphs(image=image == PixelColor.WHITE)
     return [part_1_answer, part_2_answer]
 
 
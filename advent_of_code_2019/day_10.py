@@ -1,10 +1,14 @@
 import copy
 import math
 import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from enum import Enum
+from fractions import Fraction
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Union
 
+import numpy as np
 from dataclasses import dataclass
 
 
@@ -54,11 +58,33 @@ class VisibleAsteroid(object):
         return math.sqrt(pow(self.dx, 2) + pow(self.dy, 2))
 
 
+def calculate_laser_angle_key(dx: int, dy: int) -> Tuple[int, int, Union[Fraction, int]]:
+    """ Build a sort key that orders directions by the laser angle, i.e. clockwise starting from (x=0, y=-1) since the
+    Y axis of the asteroid map goes from top to bottom. The key uses exact integer math instead of atan2.
+
+    :param dx: The x component of the direction
+    :type dx: int
+    :param dy: The y component of the direction
+    :type dy: int
+    :return: A key that sorts in the same order as VisibleAsteroid.angle
+    :rtype: Tuple[int, int, Union[Fraction, int]]
+    """
+    # The first half of the rotation goes from up to right and stops before down. The second half goes from down to
+    # left and stops before up.
+    half = 0 if dx > 0 or (dx == 0 and dy < 0) else 1
+    if dx == 0:
+        # Straight up or straight down starts each half
+        return half, 0, 0
+    # Within each half, the slope dy / dx always increases as the laser rotates clockwise
+    return half, 1, Fraction(dy, dx)
+
+
 @dataclass
 class AsteroidMonitoringStation(object):
     asteroid: Asteroid
     full_asteroid_list: List[Asteroid]
     _cached_visible_asteroid_list: Optional[List[VisibleAsteroid]] = None
+    _cached_vaporized_asteroid_list: Optional[List[Asteroid]] = None
 
     def vaporize_asteroids(self) -> List[Asteroid]:
         """ Vaporize all asteroids and return a list of asteroids in the order in which they were destroyed.
@@ -66,59 +92,115 @@ class AsteroidMonitoringStation(object):
         :return: A list of Asteroid objects in the order in which they will be vaporized.
         :rtype: List[Asteroid]
         """
-        vaporized_asteroids = list()
-        visible_asteroids = self.find_visible_asteroids()
-        while len(visible_asteroids) > 0:
-            # Sort the visible asteroids by the angle of the laser
-            sorted_visible_asteroids = sorted(visible_asteroids, key=lambda x: x.angle)
-            sorted_asteroids = [x.other_asteroid for x in sorted_visible_asteroids]
-
-            vaporized_asteroids.extend(sorted_asteroids)
+        if self._cached_vaporized_asteroid_list is not None:
+            return list(self._cached_vaporized_asteroid_list)
 
-            # Remove the asteroids as they are vaporized.
-            for asteroid in sorted_asteroids:
-                self.full_asteroid_list.remove(asteroid)
-
-            # Clear the visible asteroid cache so find_visible_asteroids() will search for new asteroids
-            self._cached_visible_asteroid_list = None
-            visible_asteroids = self.find_visible_asteroids()
-
-        return vaporized_asteroids
+        # Group the asteroids by their exact direction from the station
+        x0 = self.asteroid.x
+        y0 = self.asteroid.y
+        direction_dict: Dict[Tuple[int, int], List[Tuple[int, Asteroid]]] = dict()
+        for other_asteroid in self.full_asteroid_list:
+            dx = other_asteroid.x - x0
+            dy = other_asteroid.y - y0
+            if dx == 0 and dy == 0:
+                continue
+            steps = math.gcd(dx, dy)
+            direction_dict.setdefault((dx // steps, dy // steps), list()).append((steps, other_asteroid))
+
+        # Each rotation of the laser vaporizes the closest remaining asteroid in each direction. So the n-th closest
+        # asteroid in a direction is vaporized during rotation n, in the order of the laser angle within the rotation.
+        vaporization_key_list = list()
+        for direction, asteroid_list in direction_dict.items():
+            asteroid_list.sort(key=lambda x: x[0])
+            laser_angle_key = calculate_laser_angle_key(dx=direction[0], dy=direction[1])
+            for rotation, (_, other_asteroid) in enumerate(asteroid_list):
+                vaporization_key_list.append(((rotation, laser_angle_key), other_asteroid))
+        vaporization_key_list.sort(key=lambda x: x[0])
+
+        self._cached_vaporized_asteroid_list = [x[1] for x in vaporization_key_list]
+        return list(self._cached_vaporized_asteroid_list)
+
+    def find_nth_vaporized_asteroid(self, n: int) -> Asteroid:
+        """ Find the n-th asteroid to be vaporized, where n = 1 is the first asteroid.
+
+        :param n: The position in the vaporization order, starting at 1
+        :type n: int
+        :return: The Asteroid
+        :rtype: Asteroid
+        """
+        if self._cached_vaporized_asteroid_list is None:
+            self.vaporize_asteroids()
+        num_vaporized = len(self._cached_vaporized_asteroid_list)
+        if not 1 <= n <= num_vaporized:
+            raise ValueError(f'n must be between 1 and the number of vaporized asteroids ({num_vaporized}), got {n}')
+        return self._cached_vaporized_asteroid_list[n - 1]
 
     def find_visible_asteroids(self) -> List[VisibleAsteroid]:
         if self._cached_visible_asteroid_list is not None:
             return self._cached_visible_asteroid_list
 
-        # Determine which asteroids will be occluded/blocked by closer asteroids
-        # Track which asteroids are occluded using a dictionary where the key is the angle
-        visible_asteroid_dict: Dict[float, VisibleAsteroid] = dict()
-        for other_asteroid in self.full_asteroid_list:
-            if self.asteroid == other_asteroid:
-                continue
-            # Build a VisibleAsteroid object for each asteroid pair.
-            # This is used to calculate distance and angle between the asteroids.
-            visible_asteroid = VisibleAsteroid(asteroid=self.asteroid, other_asteroid=other_asteroid)
-            angle = visible_asteroid.angle * 180 / math.pi
-
-            if angle not in visible_asteroid_dict:
-                # No other asteroids share the same observation angle.
-                visible_asteroid_dict[angle] = visible_asteroid
-            elif visible_asteroid.distance < visible_asteroid_dict[angle].distance:
-                # Two asteroids share the same observation angle.
-                # The closer asteroid will occlude the other asteroid.
-                visible_asteroid_dict[angle] = visible_asteroid
-
-        visible_asteroids = list(visible_asteroid_dict.values())
+        # Only build a VisibleAsteroid object for the asteroids that are not occluded
+        visible_asteroids = [
+            VisibleAsteroid(asteroid=self.asteroid, other_asteroid=other_asteroid)
+            for _, other_asteroid in self._find_closest_asteroid_by_direction().values()
+        ]
         self._cached_visible_asteroid_list = visible_asteroids
         return visible_asteroids
 
+    def _find_closest_asteroid_by_direction(self) -> Dict[Tuple[int, int], Tuple[int, Asteroid]]:
+        """ Determine which asteroids will be occluded/blocked by closer asteroids.
+
+        The direction to each asteroid is reduced by the greatest common divisor of dx and dy, so asteroids on the
+        same line of sight share the exact same integer direction. The divisor is the number of grid steps along
+        that direction, which orders the asteroids by distance.
+
+        :return: (steps, asteroid) of the closest asteroid keyed by the reduced direction (dx, dy)
+        :rtype: Dict[Tuple[int, int], Tuple[int, Asteroid]]
+        """
+        x0 = self.asteroid.x
+        y0 = self.asteroid.y
+        closest_asteroid_dict: Dict[Tuple[int, int], Tuple[int, Asteroid]] = dict()
+        for other_asteroid in self.full_asteroid_list:
+            dx = other_asteroid.x - x0
+            dy = other_asteroid.y - y0
+            if dx == 0 and dy == 0:
+                continue
+            steps = math.gcd(dx, dy)
+            direction = (dx // steps, dy // steps)
+
+            closest = closest_asteroid_dict.get(direction)
+            if closest is None or steps < closest[0]:
+                # The closer asteroid will occlude the other asteroids that share the same direction.
+                closest_asteroid_dict[direction] = (steps, other_asteroid)
+        return closest_asteroid_dict
+
     def num_visible_asteroids(self) -> int:
-        return len(self.find_visible_asteroids())
+        if self._cached_visible_asteroid_list is not None:
+            return len(self._cached_visible_asteroid_list)
+        return len(self._find_closest_asteroid_by_direction())
+
+
+ASTEROID_DTYPE = np.dtype([('x', np.int64), ('y', np.int64)])
+"""Structured array format used to store the coordinates of many asteroids. """
 
 
 @dataclass
 class AsteroidCollection(object):
-    asteroids: List[Asteroid]
+    coordinates: np.ndarray
+    """The x and y coordinate of each asteroid as an array with ASTEROID_DTYPE. """
+    _cached_asteroid_list: Optional[List[Asteroid]] = None
+
+    @classmethod
+    def build_from_asteroids(cls, asteroids: List[Asteroid]) -> 'AsteroidCollection':
+        coordinates = np.array([(asteroid.x, asteroid.y) for asteroid in asteroids], dtype=ASTEROID_DTYPE)
+        return AsteroidCollection(coordinates=coordinates)
+
+    @property
+    def asteroids(self) -> List[Asteroid]:
+        """The Asteroid objects are only built the first time they are needed. """
+        if self._cached_asteroid_list is None:
+            self._cached_asteroid_list = [Asteroid(x=x, y=y) for x, y in self.coordinates.tolist()]
+        return self._cached_asteroid_list
 
     def build_monitor_station(self, asteroid: Asteroid) -> AsteroidMonitoringStation:
         """ Build a AsteroidMonitoringStation object showing which asteroids are visible.
@@ -146,21 +228,127 @@ class AsteroidCollection(object):
             monitoring_station_list.append(monitoring_station)
         return monitoring_station_list
 
-    def find_best_monitor_location(self) -> AsteroidMonitoringStation:
+    def find_best_monitor_location(self, num_workers: int = 1) -> AsteroidMonitoringStation:
         """ Find the best location for an asteroid monitoring station which can detect the largest number of other
         asteroids, i.e. has a direct line-of-sight.
 
+        :param num_workers: The number of processes that search the candidate stations. The asteroid coordinates
+            are shared with the processes through shared memory.
+        :type num_workers: int
         :return: The best location for an AsteroidMonitoringStation
         :rtype: AsteroidMonitoringStation
         """
-        monitoring_station_list = self.find_all_monitor_locations()
-        best_monitoring_station: Optional[AsteroidMonitoringStation] = None
-        for monitoring_station in monitoring_station_list:
-            if best_monitoring_station is None:
-                best_monitoring_station = monitoring_station
-            elif monitoring_station.num_visible_asteroids() > best_monitoring_station.num_visible_asteroids():
-                best_monitoring_station = monitoring_station
-        return best_monitoring_station
+        if num_workers <= 1 or len(self.coordinates) < 2:
+            num_visible_asteroids = self.count_visible_asteroids()
+            # argmax returns the first asteroid with the most visible asteroids
+            best_index = int(num_visible_asteroids.argmax())
+        else:
+            best_index = self._find_best_station_index_in_parallel(num_workers=num_workers)
+        x, y = self.coordinates[best_index].tolist()
+        return self.build_monitor_station(asteroid=Asteroid(x=x, y=y))
+
+    def _find_best_station_index_in_parallel(self, num_workers: int) -> int:
+        num_asteroids = len(self.coordinates)
+        coordinates = np.stack([self.coordinates['x'], self.coordinates['y']])
+        shared_coordinates = shared_memory.SharedMemory(create=True, size=coordinates.nbytes)
+        try:
+            np.ndarray(coordinates.shape, dtype=np.int64, buffer=shared_coordinates.buf)[:] = coordinates
+
+            # Each worker searches a contiguous range of candidate stations
+            range_size = math.ceil(num_asteroids / num_workers)
+            start_list = list(range(0, num_asteroids, range_size))
+            stop_list = [min(start + range_size, num_asteroids) for start in start_list]
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                local_best_list = list(executor.map(
+                    _find_best_station_in_range,
+                    [shared_coordinates.name] * len(start_list),
+                    [num_asteroids] * len(start_list),
+                    start_list,
+                    stop_list,
+                ))
+        finally:
+            shared_coordinates.close()
+            shared_coordinates.unlink()
+
+        # Keep the station with the most visible asteroids. Ties go to the smallest index, which matches the order
+        # of a single scan over the asteroids.
+        best_index, _ = max(local_best_list, key=lambda x: (x[1], -x[0]))
+        return best_index
+
+    def count_visible_asteroids(self, block_size: int = 1024) -> np.ndarray:
+        """ Count the number of visible asteroids for every possible monitoring station at once.
+
+        :param block_size: The number of stations processed at a time, which limits the memory to
+            block_size * len(asteroids) for each intermediate array.
+        :type block_size: int
+        :return: The number of visible asteroids for each asteroid in self.coordinates
+        :rtype: np.ndarray
+        """
+        return count_visible_asteroids(x=self.coordinates['x'], y=self.coordinates['y'], block_size=block_size)
+
+
+def _find_best_station_in_range(shared_memory_name: str, num_asteroids: int, start: int, stop: int) -> Tuple[int, int]:
+    """ Find the station with the most visible asteroids between start and stop. The x and y coordinates of every
+    asteroid are read from the shared memory block as an array with the shape (2, num_asteroids).
+
+    :return: The index of the best station and its number of visible asteroids
+    :rtype: Tuple[int, int]
+    """
+    shared_coordinates = shared_memory.SharedMemory(name=shared_memory_name)
+    try:
+        coordinates = np.ndarray((2, num_asteroids), dtype=np.int64, buffer=shared_coordinates.buf)
+        num_visible = count_visible_asteroids(x=coordinates[0], y=coordinates[1], station_start=start,
+                                              station_stop=stop)
+        del coordinates  # Release the view of the buffer before closing the shared memory
+    finally:
+        shared_coordinates.close()
+    local_index = int(num_visible.argmax())
+    return start + local_index, int(num_visible[local_index])
+
+
+def count_visible_asteroids(x: np.ndarray, y: np.ndarray, block_size: int = 1024, station_start: int = 0,
+                            station_stop: Optional[int] = None) -> np.ndarray:
+    """ Count the number of asteroids visible from each asteroid. Asteroids on the same line of sight share the same
+    direction after dx and dy are divided by their greatest common divisor, so the number of visible asteroids is the
+    number of unique directions.
+
+    :param x: The x coordinate of each asteroid
+    :type x: np.ndarray
+    :param y: The y coordinate of each asteroid
+    :type y: np.ndarray
+    :param block_size: The number of stations processed at a time
+    :type block_size: int
+    :param station_start: The index of the first asteroid to use as a station
+    :type station_start: int
+    :param station_stop: The index after the last asteroid to use as a station, defaults to every asteroid
+    :type station_stop: Optional[int]
+    :return: The number of visible asteroids for each station from station_start to station_stop
+    :rtype: np.ndarray
+    """
+    num_asteroids = len(x)
+    if station_stop is None:
+        station_stop = num_asteroids
+    num_visible = np.zeros(station_stop - station_start, dtype=np.int64)
+    if num_asteroids == 0:
+        return num_visible
+    # Reduced directions are within the size of the map, so they can be packed into a single integer
+    span_x = int(x.max() - x.min())
+    span_y = int(y.max() - y.min())
+
+    for start in range(station_start, station_stop, block_size):
+        stop = min(start + block_size, station_stop)
+        dx = x[np.newaxis, :] - x[start:stop, np.newaxis]
+        dy = y[np.newaxis, :] - y[start:stop, np.newaxis]
+        divisor = np.gcd(dx, dy)
+        is_station = divisor == 0  # The station itself
+        divisor[is_station] = 1
+
+        direction = (dx // divisor + span_x) * (2 * span_y + 1) + (dy // divisor + span_y)
+        direction[is_station] = -1
+        # After sorting each row the station is first, and every change in value is a new direction
+        direction.sort(axis=1)
+        num_visible[start - station_start:stop - station_start] = (np.diff(direction, axis=1) != 0).sum(axis=1)
+    return num_visible
 
 
 def build_asteroid_collection_from_map(asteroid_map: List[str]) -> AsteroidCollection:
@@ -172,13 +360,29 @@ def build_asteroid_collection_from_map(asteroid_map: List[str]) -> AsteroidColle
     :return: The constructed AsteroidCollection
     :rtype: AsteroidCollection
     """
-    asteroids = list()
-    for y, map_row in enumerate(asteroid_map):
-        for x, element in enumerate(map_row):
-            # Ignore 'space' elements found in the asteroid map. Only add asteroids.
-            if AsteroidMapElement(element) == AsteroidMapElement.ASTEROID:
-                asteroids.append(Asteroid(x=x, y=y))
-    return AsteroidCollection(asteroids=asteroids)
+    # Empty rows, such as a blank line at the end of the input file, are treated as rows of space
+    num_col = max((len(map_row) for map_row in asteroid_map), default=0)
+    if any(len(map_row) not in (0, num_col) for map_row in asteroid_map):
+        raise ValueError(f'Every row of the asteroid map must have {num_col} columns')
+    asteroid_map = [map_row or AsteroidMapElement.SPACE.value * num_col for map_row in asteroid_map]
+
+    # Convert the whole map into a grid of character codes at once
+    map_bytes = ''.join(asteroid_map).encode()
+    if len(map_bytes) != len(asteroid_map) * num_col:
+        raise ValueError('The asteroid map contains characters that are not ASCII')
+    grid = np.frombuffer(map_bytes, dtype=np.uint8).reshape((len(asteroid_map), num_col))
+
+    is_asteroid = grid == ord(AsteroidMapElement.ASTEROID.value)
+    if np.any(~is_asteroid & (grid != ord(AsteroidMapElement.SPACE.value))):
+        unexpected = sorted(set(map_bytes.decode()) - {e.value for e in AsteroidMapElement})
+        raise ValueError(f'Unexpected {AsteroidMapElement} in the asteroid map: {unexpected}')
+
+    # Ignore 'space' elements found in the asteroid map. Only add asteroids, ordered by row then column.
+    y, x = np.nonzero(is_asteroid)
+    coordinates = np.zeros(len(x), dtype=ASTEROID_DTYPE)
+    coordinates['x'] = x
+    coordinates['y'] = y
+    return AsteroidCollection(coordinates=coordinates)
 
 
 class Day10Tests(unittest.TestCase):
@@ -256,6 +460,7 @@ class Day10Tests(unittest.TestCase):
 
         self.assertEqual(monitor_station.asteroid, target_asteroid)
         self.assertEqual(monitor_station.num_visible_asteroids(), visible_asteroid_count)
+        self.assertEqual(len(monitor_station.find_visible_asteroids()), visible_asteroid_count)
 
     def test_part1_simple_example(self):
         # The best location for a new monitoring station on this map is at 3,4 because it can detect 8 asteroids,
@@ -273,6 +478,23 @@ class Day10Tests(unittest.TestCase):
         self.assertIn(Asteroid(x=1, y=0), asteroid_collection.asteroids)
         self.assertIn(expected_asteroid, asteroid_collection.asteroids)
         self.assertEqual(10, len(asteroid_collection.asteroids))
+        self.assertEqual(asteroid_collection.coordinates[0].tolist(), (1, 0))
+        self.assertEqual(AsteroidCollection.build_from_asteroids(asteroid_collection.asteroids).asteroids,
+                         asteroid_collection.asteroids)
+        with self.assertRaises(ValueError):
+            build_asteroid_collection_from_map(asteroid_map=['.#..#', '..X..'])
+        with self.assertRaises(ValueError):
+            build_asteroid_collection_from_map(asteroid_map=['.#..#', '...'])
+        # A blank line at the end of the input file is ignored
+        trailing_blank_collection = build_asteroid_collection_from_map(asteroid_map=['.#..#', '#....', ''])
+        self.assertEqual(trailing_blank_collection.asteroids, [Asteroid(x=1, y=0), Asteroid(x=4, y=0),
+                                                               Asteroid(x=0, y=1)])
+
+        # Every asteroid in a square can see the other 3 asteroids, so the first asteroid is the best location
+        square_collection = build_asteroid_collection_from_map(asteroid_map=['.#.#', '....', '.#.#'])
+        for num_workers in [1, 2, 4]:
+            monitor_station = square_collection.find_best_monitor_location(num_workers=num_workers)
+            self.assertEqual(monitor_station.asteroid, Asteroid(x=1, y=0))
 
         self.check_monitor_station(asteroid_map, expected_asteroid, expected_num_visible_asteroid)
 
@@ -358,6 +580,11 @@ class Day10Tests(unittest.TestCase):
         ]
         self.check_monitor_station(asteroid_map, expected_asteroid, expected_num_visible_asteroid)
 
+        # The 200th asteroid to be vaporized is at 8,2
+        monitor_station = build_asteroid_collection_from_map(asteroid_map=asteroid_map).find_best_monitor_location()
+        self.assertEqual(monitor_station.find_nth_vaporized_asteroid(n=200), Asteroid(x=8, y=2))
+        self.assertEqual(len(monitor_station.vaporize_asteroids()), 299)
+
     def check_monitor_station(self, asteroid_map: List[str], asteroid: Asteroid, num_visible_asteroid: int):
         """ Verify the correct asteroid monitoring station is selected.
 
@@ -373,6 +600,14 @@ class Day10Tests(unittest.TestCase):
         self.assertEqual(monitor_station.asteroid, asteroid)
         self.assertEqual(monitor_station.num_visible_asteroids(), num_visible_asteroid)
 
+        # The vectorized count must match each individual monitoring station
+        expected_counts = [x.num_visible_asteroids() for x in asteroid_collection.find_all_monitor_locations()]
+        self.assertListEqual(asteroid_collection.count_visible_asteroids().tolist(), expected_counts)
+        self.assertListEqual(asteroid_collection.count_visible_asteroids(block_size=7).tolist(), expected_counts)
+
+        monitor_station = asteroid_collection.find_best_monitor_location(num_workers=3)
+        self.assertEqual(monitor_station.asteroid, asteroid)
+
     def test_part2_vaporization1(self):
         # The asteroid with the new monitoring station (and laser) is marked X
         asteroid_station_map = [
@@ -439,6 +674,23 @@ class Day10Tests(unittest.TestCase):
         actual_vaporized_asteroids = monitor_station.vaporize_asteroids()
 
         self.assertListEqual(actual_vaporized_asteroids, expected_vaporized_asteroids)
+        self.assertEqual(monitor_station.find_nth_vaporized_asteroid(n=1), expected_vaporized_asteroids[0])
+        self.assertEqual(monitor_station.find_nth_vaporized_asteroid(n=36), expected_vaporized_asteroids[-1])
+        for n in [0, -1, 37]:
+            with self.assertRaises(ValueError):
+                monitor_station.find_nth_vaporized_asteroid(n=n)
+
+    def test_laser_angle_key(self):
+        # The laser starts pointing up and rotates clockwise
+        direction_list = [(0, -1), (1, -2), (1, -1), (2, -1), (1, 0), (2, 1), (1, 1), (0, 1), (-1, 1), (-1, 0),
+                          (-1, -1), (-1, -2)]
+        keys = [calculate_laser_angle_key(dx=dx, dy=dy) for dx, dy in direction_list]
+        self.assertListEqual(sorted(keys), keys)
+
+        station = Asteroid(x=0, y=0)
+        angles = [VisibleAsteroid(asteroid=station, other_asteroid=Asteroid(x=dx, y=dy)).angle
+                  for dx, dy in direction_list]
+        self.assertListEqual(sorted(angles), angles)
 
     @staticmethod
     def process_vaporization_map(vaporize_map: List[str]) -> List[Asteroid]:
@@ -488,8 +740,7 @@ def day_10(txt_path: Path) -> list:
     part_1_answer = monitor_station.num_visible_asteroids()
 
     # The Elves are placing bets on which will be the 200th asteroid to be vaporized.
-    vaporized_asteroids = monitor_station.vaporize_asteroids()
-    asteroid_200 = vaporized_asteroids[200 - 1]
+    asteroid_200 = monitor_station.find_nth_vaporized_asteroid(n=200)
 
     # Part 2: What do you get if you multiply its X coordinate by 100 and then add its Y coordinate?
     part_2_answer = asteroid_200.x * 100 + asteroid_200.y
@@ -1,14 +1,13 @@
 import copy
-import math
 import unittest
-from collections import defaultdict
 from enum import IntEnum
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import numpy as np
 from dataclasses import dataclass
 
+from advent_of_code_2019.glyph_ocr import read_glyphs
 from advent_of_code_2019.intcode_computer import IntCodeProgram
 
 
@@ -22,15 +21,13 @@ class Rotation(IntEnum):
     RIGHT_90 = 1
 
     @property
-    def rotation_matrix(self) -> np.ndarray:
-        angle = math.pi / 2
-        if self == self.RIGHT_90:
-            angle *= -1
-
-        return np.array([
-            [np.cos(angle), -1 * np.sin(angle)],
-            [np.sin(angle), np.cos(angle)],
-        ])
+    def direction_step(self) -> int:
+        """The change of the index into DIRECTIONS, which lists the directions clockwise. """
+        return 1 if self == self.RIGHT_90 else -1
+
+
+DIRECTIONS: List[Tuple[int, int]] = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+"""The (dx, dy) of each direction the robot can face, clockwise starting with up. """
 
 
 @dataclass(frozen=True, order=True)
@@ -49,12 +46,90 @@ class Position(object):
     vector: Point
 
 
+class PanelCanvas(object):
+    """Dense grid of panel colors that grows in any direction as the robot moves. Every panel starts black.
+
+    Row index y + origin_y and column index x + origin_x hold the panel at (x, y). When a panel outside of the grid
+    is used, the grid at least doubles in that direction so the cost of growing is amortized.
+    """
+
+    def __init__(self, initial_size: int = 8):
+        self.colors = np.full((initial_size, initial_size), Color.BLACK, dtype=np.uint8)
+        self.painted = np.zeros((initial_size, initial_size), dtype=np.bool_)
+        """True for every panel that was painted at least once. """
+        self.origin_x = initial_size // 2
+        self.origin_y = initial_size // 2
+        self.num_painted = 0
+        """The number of panels that were painted at least once. """
+
+    def _grow(self, col: int, row: int):
+        num_row, num_col = self.colors.shape
+        pad_left = max(num_col, -col) if col < 0 else 0
+        pad_right = max(num_col, col - num_col + 1) if col >= num_col else 0
+        pad_top = max(num_row, -row) if row < 0 else 0
+        pad_bottom = max(num_row, row - num_row + 1) if row >= num_row else 0
+        pad_width = ((pad_top, pad_bottom), (pad_left, pad_right))
+        self.colors = np.pad(self.colors, pad_width, constant_values=Color.BLACK)
+        self.painted = np.pad(self.painted, pad_width, constant_values=False)
+        self.origin_x += pad_left
+        self.origin_y += pad_top
+
+    def get_color(self, x: int, y: int) -> Color:
+        col = x + self.origin_x
+        row = y + self.origin_y
+        num_row, num_col = self.colors.shape
+        if 0 <= col < num_col and 0 <= row < num_row:
+            return Color(self.colors[row, col])
+        return Color.BLACK
+
+    def set_color(self, x: int, y: int, color: Color, paint: bool = True):
+        """ Set the color of the panel at (x, y)
+
+        :param paint: Count the panel as painted. Use False to set the starting color of a panel.
+        :type paint: bool
+        """
+        col = x + self.origin_x
+        row = y + self.origin_y
+        num_row, num_col = self.colors.shape
+        if not (0 <= col < num_col and 0 <= row < num_row):
+            self._grow(col=col, row=row)
+            col = x + self.origin_x
+            row = y + self.origin_y
+        self.colors[row, col] = color
+        if paint and not self.painted[row, col]:
+            self.painted[row, col] = True
+            self.num_painted += 1
+
+    def get_panel_colors(self) -> Dict[Point, Color]:
+        """The color of each painted panel keyed by Point. """
+        rows, cols = np.nonzero(self.painted)
+        return {
+            Point(x=col - self.origin_x, y=row - self.origin_y): Color(color)
+            for row, col, color in zip(rows.tolist(), cols.tolist(), self.colors[rows, cols].tolist())
+        }
+
+    def render(self) -> np.ndarray:
+        """ View of the colors of the painted or white panels, without copying the canvas.
+        Row 0 is the top of the hull, i.e. the largest y, so the image can be read like the puzzle examples.
+        """
+        is_used = self.painted | (self.colors != Color.BLACK)
+        used_rows = np.flatnonzero(is_used.any(axis=1))
+        used_cols = np.flatnonzero(is_used.any(axis=0))
+        if len(used_rows) == 0:
+            return self.colors[0:0, 0:0]
+        row_slice = slice(used_rows[-1], used_rows[0] - 1 if used_rows[0] > 0 else None, -1)
+        return self.colors[row_slice, used_cols[0]:used_cols[-1] + 1]
+
+
 class HullPaintingRobot(object):
-    def __init__(self, intcode: List[int]):
+    def __init__(self, intcode: List[int], start_color: Color = Color.BLACK):
         self.program = IntCodeProgram(intcode=intcode)
-        self.current_position = np.array([0, 0], dtype=np.int)  # [x,y]
-        self.current_vector = np.array([0, 1], dtype=np.int)  # The robot starts facing up, i.e. pointing to (x=0, y=1)
-        self.panel_color_map: Dict[Point, Color] = defaultdict(lambda: Color.BLACK)
+        self.x = 0
+        self.y = 0
+        self.direction_index = 0  # The robot starts facing up, i.e. pointing to (x=0, y=1)
+        self.panel_canvas = PanelCanvas()
+        # The starting panel does not count as painted
+        self.panel_canvas.set_color(x=0, y=0, color=start_color, paint=False)
 
     def run(self):
         continue_running = True
@@ -81,24 +156,18 @@ class HullPaintingRobot(object):
             continue_running = not self.program.ran_to_completion
 
     def apply_paint(self, color: Color):
-        x, y = self.current_position
-        point = Point(x=x, y=y)
-        self.panel_color_map[point] = color
+        self.panel_canvas.set_color(x=self.x, y=self.y, color=color)
 
     def apply_rotation_and_move(self, rotation: Rotation):
-        # Apply the rotation by using a rotation matrix.
-        self.current_vector = np.dot(rotation.rotation_matrix, self.current_vector).astype(dtype=np.int)
-        # Apply the new vector to calculate the new position.
-        # The magnitude of the vector is always 1 so the robot will only move one panel at a time.
-        self.current_position = self.current_position + self.current_vector
+        # Turning 90 degrees moves to the next or previous direction in the clockwise list of directions.
+        self.direction_index = (self.direction_index + rotation.direction_step) % 4
+        # The robot only moves one panel at a time.
+        dx, dy = DIRECTIONS[self.direction_index]
+        self.x += dx
+        self.y += dy
 
     def get_color_at_current_position(self) -> Color:
-        x, y = self.current_position
-        point = Point(x=x, y=y)
-        return self.panel_color_map[point]
-
-    def _expand_panel_map(self):
-        self.panel_color_map = np.full((1, 1), Color.BLACK)
+        return self.panel_canvas.get_color(x=self.x, y=self.y)
 
 
 class MockIntCodeProgram(IntCodeProgram):
@@ -166,9 +235,34 @@ class Day9Tests(unittest.TestCase):
         )
         robot.run()
 
-        self.assertEqual(len(robot.panel_color_map), expected_count)
+        self.assertEqual(robot.panel_canvas.num_painted, expected_count)
         self.assertListEqual(robot.program.program_input, [])
-        self.assertDictEqual(robot.panel_color_map, expected_panel_color_map)
+        self.assertDictEqual(robot.panel_canvas.get_panel_colors(), expected_panel_color_map)
+        # The robot ends at (0, 1) facing left
+        self.assertEqual((robot.x, robot.y, DIRECTIONS[robot.direction_index]), (0, 1, (-1, 0)))
+
+        # ..#
+        # ..#
+        # ##.
+        self.assertListEqual(robot.panel_canvas.render().tolist(), [[0, 0, 1], [0, 0, 1], [1, 1, 0]])
+
+    def test_panel_canvas(self):
+        canvas = PanelCanvas(initial_size=2)
+        canvas.set_color(x=0, y=0, color=Color.WHITE, paint=False)
+        self.assertEqual(canvas.num_painted, 0)
+        # Grow the canvas in every direction
+        for x, y in [(5, 0), (-7, 0), (0, 9), (0, -11), (5, 0)]:
+            canvas.set_color(x=x, y=y, color=Color.WHITE)
+        self.assertEqual(canvas.num_painted, 4)
+        self.assertEqual(canvas.get_color(x=-7, y=0), Color.WHITE)
+        self.assertEqual(canvas.get_color(x=0, y=0), Color.WHITE)
+        self.assertEqual(canvas.get_color(x=1, y=1), Color.BLACK)
+        self.assertEqual(canvas.get_color(x=100, y=-100), Color.BLACK)
+
+        image = canvas.render()
+        self.assertEqual(image.shape, (21, 13))
+        self.assertTrue(np.shares_memory(image, canvas.colors))
+        self.assertEqual(image[0, 7], Color.WHITE)  # (0, 9) is the top row
 
 
 def day_11(txt_path: Path) -> list:
@@ -183,8 +277,13 @@ def day_11(txt_path: Path) -> list:
     robot.run()
 
     # Part 1: How many panels does it paint at least once?
-    part_1_answer = len(robot.panel_color_map)
-    part_2_answer = None
+    part_1_answer = robot.panel_canvas.num_painted
+
+    # Part 2: After starting the robot on a single white panel instead, what registration identifier does it paint on
+    # your hull?
+    robot = HullPaintingRobot(intcode=copy.copy(intcode), start_color=Color.WHITE)
+    robot.run()
+    part_2_answer = read_glyphs(image=robot.panel_canvas.render() == Color.WHITE)
 
     return [part_1_answer, part_2_answer]
 
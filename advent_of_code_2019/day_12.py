@@ -2,10 +2,12 @@ import copy
 import math
 import re
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 from itertools import combinations
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Sequence
 
+import numpy as np
 from dataclasses import dataclass
 
 
@@ -54,130 +56,177 @@ def import_moon_from_string(definition: str) -> Moon:
     )
 
 
-def simulate(moon_list: List[Moon]) -> List[Moon]:
-    """ Simulate the provided moons for one time step.
+def calculate_gravity(positions: np.ndarray, block_size: int = 1024, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """ Calculate the change in velocity of every moon caused by the gravity of every other moon. On each axis the
+    velocity changes by +1 for every moon with a larger position and by -1 for every moon with a smaller position.
 
-    :param moon_list: The list of Moon objects to simulate.
-    :type moon_list: List[Moon]
-    :return: The list of Moon objects after one time step.
-    :rtype: List[Moon]
+    :param positions: The position of each moon as an int array with the shape (num_moons, num_axes) or (num_moons,)
+    :type positions: np.ndarray
+    :param block_size: The number of moons processed at a time, which limits the memory used by the pairwise
+        differences to block_size * num_moons * num_axes integers
+    :type block_size: int
+    :param out: An array with the same shape as positions to store the result in
+    :type out: Optional[np.ndarray]
+    :return: The change in velocity of each moon
+    :rtype: np.ndarray
     """
-    # Simulate the motion of the moons in time steps. Within each time step, first update the velocity of every moon
-    # by applying gravity. Then, once all moons' velocities have been updated, update the position of every moon by
-    # applying velocity. Time progresses by one step once all of the positions are updated.
-
     # To apply gravity, consider every pair of moons. On each axis (x, y, and z), the velocity of each moon changes
     # by exactly +1 or -1 to pull the moons together. For example, if Ganymede has an x position of 3, and Callisto
     # has a x position of 5, then Ganymede's x velocity changes by +1 (because 5 > 3) and Callisto's x velocity
     # changes by -1 (because 3 < 5). However, if the positions on a given axis are the same, the velocity on that
     # axis does not change for that pair of moons.
-    for moon0, moon1 in combinations(moon_list, r=2):
-
-        if moon0.x < moon1.x:
-            moon0.dx += 1
-            moon1.dx -= 1
-        elif moon0.x > moon1.x:
-            moon0.dx -= 1
-            moon1.dx += 1
-
-        if moon0.y < moon1.y:
-            moon0.dy += 1
-            moon1.dy -= 1
-        elif moon0.y > moon1.y:
-            moon0.dy -= 1
-            moon1.dy += 1
-
-        if moon0.z < moon1.z:
-            moon0.dz += 1
-            moon1.dz -= 1
-        elif moon0.z > moon1.z:
-            moon0.dz -= 1
-            moon1.dz += 1
-
-    # Once all gravity has been applied, apply velocity: simply add the velocity of each moon to its own position. 
-    # For example, if Europa has a position of x=1, y=2, z=3 and a velocity of x=-2, y=0,z=3, then its new position 
-    # would be x=-1, y=2, z=6. This process does not modify the velocity of any moon. 
-    for moon in moon_list:
-        moon.x += moon.dx
-        moon.y += moon.dy
-        moon.z += moon.dz
+    # The sign of the difference between the positions is exactly that change, and the sign of a moon compared with
+    # itself is zero.
+    if out is None:
+        out = np.empty_like(positions)
+    for start in range(0, len(positions), block_size):
+        stop = min(start + block_size, len(positions))
+        differences = positions[np.newaxis] - positions[start:stop, np.newaxis]
+        np.sign(differences).sum(axis=1, out=out[start:stop])
+    return out
+
+
+@dataclass
+class MoonSystem(object):
+    positions: np.ndarray
+    """The x, y and z position of each moon as an int array with the shape (num_moons, 3). """
+    velocities: np.ndarray
+    """The x, y and z velocity of each moon as an int array with the shape (num_moons, 3). """
+
+    @classmethod
+    def build_from_moons(cls, moon_list: List[Moon]) -> 'MoonSystem':
+        state = np.array([(moon.x, moon.y, moon.z, moon.dx, moon.dy, moon.dz) for moon in moon_list],
+                         dtype=np.int64).reshape(-1, 6)
+        return MoonSystem(positions=state[:, :3].copy(), velocities=state[:, 3:].copy())
+
+    @property
+    def num_moons(self) -> int:
+        return len(self.positions)
 
+    @property
+    def total_energy(self) -> int:
+        # The total energy for a single moon is its potential energy multiplied by its kinetic energy.
+        potential_energy = np.abs(self.positions).sum(axis=1)
+        kinetic_energy = np.abs(self.velocities).sum(axis=1)
+        return int((potential_energy * kinetic_energy).sum())
+
+    def step(self, num_steps: int = 1, block_size: int = 1024) -> None:
+        """ Simulate the moons in place. Within each time step the gravity of every pair of moons is applied to the
+        velocities first, and then the velocities are added to the positions.
+
+        :param num_steps: The number of time steps to simulate
+        :type num_steps: int
+        :param block_size: The number of moons processed at a time when calculating gravity
+        :type block_size: int
+        """
+        # Simulate the motion of the moons in time steps. Within each time step, first update the velocity of every
+        # moon by applying gravity. Then, once all moons' velocities have been updated, update the position of every
+        # moon by applying velocity. Time progresses by one step once all of the positions are updated.
+        gravity = np.empty_like(self.positions)
+        for _ in range(num_steps):
+            calculate_gravity(self.positions, block_size=block_size, out=gravity)
+            self.velocities += gravity
+            # Once all gravity has been applied, apply velocity: simply add the velocity of each moon to its own
+            # position. For example, if Europa has a position of x=1, y=2, z=3 and a velocity of x=-2, y=0,z=3, then
+            # its new position would be x=-1, y=2, z=6. This process does not modify the velocity of any moon.
+            self.positions += self.velocities
+
+    def get_moon(self, index: int) -> Moon:
+        """ Build a Moon object with the current state of a single moon. The Moon is a copy, so changing it does not
+        change the MoonSystem.
+        """
+        x, y, z = self.positions[index].tolist()
+        dx, dy, dz = self.velocities[index].tolist()
+        return Moon(x=x, y=y, z=z, dx=dx, dy=dy, dz=dz)
+
+    def get_moons(self) -> List[Moon]:
+        return [self.get_moon(index) for index in range(self.num_moons)]
+
+    def update_moons(self, moon_list: List[Moon]) -> None:
+        """ Copy the current state of every moon to the Moon objects with the same index. """
+        for moon, (x, y, z), (dx, dy, dz) in zip(moon_list, self.positions.tolist(), self.velocities.tolist()):
+            moon.x, moon.y, moon.z = x, y, z
+            moon.dx, moon.dy, moon.dz = dx, dy, dz
+
+
+def simulate(moon_list: List[Moon]) -> List[Moon]:
+    """ Simulate the provided moons for one time step. The moons are updated in place.
+    Every call copies the moons into a new MoonSystem and back, so callers that simulate many steps should build one
+    MoonSystem with MoonSystem.build_from_moons and call MoonSystem.step instead.
+
+    :param moon_list: The list of Moon objects to simulate.
+    :type moon_list: List[Moon]
+    :return: The list of Moon objects after one time step.
+    :rtype: List[Moon]
+    """
+    moon_system = MoonSystem.build_from_moons(moon_list=moon_list)
+    moon_system.step()
+    moon_system.update_moons(moon_list=moon_list)
     return moon_list
 
 
-def calculate_steps_until_state_resets(moon_list: List[Moon]) -> int:
+def find_axis_period(positions: Sequence[int], velocities: Sequence[int]) -> int:
+    """ Find the number of steps until the position and velocity of every moon on a single axis return to their
+    initial values. The axes do not affect each other, so each axis can be simulated on its own.
+
+    The simulation is time reversible, so when every velocity starts at zero the first step k where every velocity
+    is zero again is half way through the period, and only k steps are simulated. The state at step 2 * k is always
+    the initial state, so the period is 2 * k unless the positions already match at step k.
+
+    :param positions: The initial position of each moon on the axis
+    :type positions: Sequence[int]
+    :param velocities: The initial velocity of each moon on the axis
+    :type velocities: Sequence[int]
+    :return: The number of steps in the period of the axis
+    :rtype: int
+    """
+    positions_t0 = np.array(positions, dtype=np.int64)
+    velocities_t0 = np.array(velocities, dtype=np.int64)
+    axis_positions = positions_t0.copy()
+    axis_velocities = velocities_t0.copy()
+    gravity = np.empty_like(axis_positions)
+    starts_at_rest = not velocities_t0.any()
+
+    num_steps = 0
+    while True:
+        num_steps += 1
+        calculate_gravity(axis_positions, out=gravity)
+        axis_velocities += gravity
+        axis_positions += axis_velocities
+
+        if starts_at_rest:
+            if not axis_velocities.any():
+                if np.array_equal(axis_positions, positions_t0):
+                    return num_steps
+                return 2 * num_steps
+        elif np.array_equal(axis_positions, positions_t0) and np.array_equal(axis_velocities, velocities_t0):
+            return num_steps
+
+
+def calculate_steps_until_state_resets(moon_list: List[Moon], num_workers: int = 1) -> int:
     """ Use a faster method to determine when the moons will return to their initial state without simulating it.
     If the planets are periodic for all three dimensions, then they will be periodic for a single dimension.
-        1) Find how long it takes for each dimension to revert to the initial position.
+        1) Find how long it takes for each dimension to revert to the initial position, see find_axis_period.
         2) Calculate the least common multiple of the periods to determine when all 3 dimensions will reset.
 
-    :param moon_list: The list of Moon objects to simulate.
+    :param moon_list: The list of Moon objects to simulate. The moons are not changed.
     :type moon_list: List[Moon]
+    :param num_workers: The number of processes that simulate the dimensions at the same time
+    :type num_workers: int
     :return: The number of steps it would take for all moons to revert to their initial state.
     :rtype: int
     """
-    moon_list_t0 = copy.deepcopy(moon_list)
+    moon_system = MoonSystem.build_from_moons(moon_list=moon_list)
+    # The initial positions and velocities of each attribute/dimension
+    positions_per_axis = moon_system.positions.T.tolist()
+    velocities_per_axis = moon_system.velocities.T.tolist()
 
     # The number of required steps for each attribute/dimension to reset to the t0 state.
-    num_req_step_per_attr = list()
-
-    # TODO: Is there a way to do the same thing without using setattr and getattr without code duplication?
-
-    for pos_attr_name, vel_attr_name in [('x', 'dx'), ('y', 'dy'), ('z', 'dz')]:
-        # The position and velocity attribute names
-
-        num_steps = 0
-        continue_simulation = True
-        while continue_simulation:
-            num_steps += 1
-
-            for moon0, moon1 in combinations(moon_list, r=2):
-                # if moon0.x < moon1.x:
-                #      moon0.dx += 1
-                #      moon1.dx -= 1
-                #  elif moon0.x > moon1.x:
-                #      moon0.dx -= 1
-                #      moon1.dx += 1
-                # The commented code above is equivalent to the code below
-                # when pos_attr_name == 'x' and vel_attr_name == 'dy'
-
-                vel_moon0 = getattr(moon0, vel_attr_name)
-                vel_moon1 = getattr(moon1, vel_attr_name)
-
-                pos_moon0 = getattr(moon0, pos_attr_name)
-                pos_moon1 = getattr(moon1, pos_attr_name)
-
-                if pos_moon0 < pos_moon1:
-                    vel_moon0 += 1
-                    vel_moon1 -= 1
-                elif pos_moon0 > pos_moon1:
-                    vel_moon0 -= 1
-                    vel_moon1 += 1
-
-                setattr(moon0, vel_attr_name, vel_moon0)
-                setattr(moon1, vel_attr_name, vel_moon1)
-
-            for moon in moon_list:
-                # moon.x += moon.dx
-                # moon.y += moon.dy
-                # moon.z += moon.dz
-                # The commented code above is equivalent to the code below
-                # when pos_attr_name == 'x' and vel_attr_name == 'dy'
-                vel = getattr(moon, vel_attr_name)
-                pos = getattr(moon, pos_attr_name)
-                setattr(moon, pos_attr_name, pos + vel)
-
-            # End the simulation if attribute/dimension position and velocity match the t0 state.
-            initial_states_matching = list()
-            for moon, moon_t0 in zip(moon_list, moon_list_t0):
-                match_pos = getattr(moon, pos_attr_name) == getattr(moon_t0, pos_attr_name)
-                match_vel = getattr(moon, vel_attr_name) == getattr(moon_t0, vel_attr_name)
-                is_match = match_pos and match_vel
-                initial_states_matching.append(is_match)
-            if all(initial_states_matching):
-                continue_simulation = False
-
-        num_req_step_per_attr.append(num_steps)
+    if num_workers <= 1:
+        num_req_step_per_attr = list(map(find_axis_period, positions_per_axis, velocities_per_axis))
+    else:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(positions_per_axis))) as executor:
+            num_req_step_per_attr = list(executor.map(find_axis_period, positions_per_axis, velocities_per_axis))
 
     # Find the least common multiple of every value in the list
     values = num_req_step_per_attr
@@ -288,6 +337,36 @@ class Day12Tests(unittest.TestCase):
         total_energy = sum([x.total_energy for x in moons_step100])
         self.assertEqual(total_energy, expected_energy)
 
+    def test_moon_system_matches_moons(self):
+        moon_list = [
+            Moon(x=-8, y=-10, z=0),
+            Moon(x=5, y=5, z=10),
+            Moon(x=2, y=-7, z=3),
+            Moon(x=9, y=-8, z=-3),
+        ]
+        moon_system = MoonSystem.build_from_moons(moon_list=moon_list)
+        self.assertListEqual(moon_system.get_moons(), moon_list)
+
+        # Splitting the moons into blocks must not change the result
+        moon_system.step(num_steps=100, block_size=3)
+        self.assertEqual(moon_system.total_energy, 1940)
+        self.assertEqual(moon_system.get_moon(0), Moon(x=8, y=-12, z=-9, dx=-7, dy=3, dz=0))
+
+        moon_system.update_moons(moon_list=moon_list)
+        self.assertListEqual(moon_list, moon_system.get_moons())
+
+    def test_calculate_gravity(self):
+        rng = np.random.default_rng(12)
+        positions = rng.integers(-20, 20, size=(50, 3))
+        expected_gravity = np.zeros_like(positions)
+        for i, j in combinations(range(len(positions)), r=2):
+            expected_gravity[i] += np.sign(positions[j] - positions[i])
+            expected_gravity[j] += np.sign(positions[i] - positions[j])
+        for block_size in [1, 7, 1024]:
+            np.testing.assert_array_equal(calculate_gravity(positions, block_size=block_size), expected_gravity)
+        # A single axis
+        np.testing.assert_array_equal(calculate_gravity(positions[:, 1].copy()), expected_gravity[:, 1])
+
     def test_part2_example1(self):
         # Determine the number of steps that must occur before all of the moons' positions and velocities exactly
         # match a previous point in time.
@@ -346,6 +425,40 @@ class Day12Tests(unittest.TestCase):
         expected_steps = 4686774924
         self.assertEqual(expected_steps, actual_steps)
 
+    def test_simulate_until_state_resets_in_parallel(self):
+        moon_list = [
+            Moon(x=-8, y=-10, z=0),
+            Moon(x=5, y=5, z=10),
+            Moon(x=2, y=-7, z=3),
+            Moon(x=9, y=-8, z=-3),
+        ]
+        actual_steps = calculate_steps_until_state_resets(moon_list=moon_list, num_workers=3)
+        self.assertEqual(4686774924, actual_steps)
+        self.assertEqual(moon_list[0], Moon(x=-8, y=-10, z=0))
+
+    def test_find_axis_period(self):
+        # The x axis of example 1
+        self.assertEqual(find_axis_period(positions=[-1, 2, 4, 3], velocities=[0, 0, 0, 0]), 18)
+        # Two moons at rest on the same position never move
+        self.assertEqual(find_axis_period(positions=[5, 5], velocities=[0, 0]), 1)
+
+        # Compare with simulating until the state matches, including moons that do not start at rest
+        rng = np.random.default_rng(12)
+        for _ in range(20):
+            positions = rng.integers(-5, 5, size=3).tolist()
+            # The total momentum must be zero or the moons drift away and never return
+            velocities = rng.integers(-1, 2, size=2).tolist()
+            velocities.append(-sum(velocities))
+            moon_system = MoonSystem(positions=np.array([positions]).T, velocities=np.array([velocities]).T)
+            num_steps = 0
+            while True:
+                num_steps += 1
+                moon_system.step()
+                if moon_system.positions[:, 0].tolist() == positions and \
+                        moon_system.velocities[:, 0].tolist() == velocities:
+                    break
+            self.assertEqual(find_axis_period(positions=positions, velocities=velocities), num_steps)
+
 
 def day_12(txt_path: Path) -> list:
     # Load puzzle input. Multiple rows with moon position definitions on each row.
@@ -356,19 +469,15 @@ def day_12(txt_path: Path) -> list:
 
     # What is the total energy in the system after simulating the moons given in your scan for 1000 steps?
     final_step_count = 1000
-    moons_step_1000 = copy.deepcopy(moons_step_0)
-    step_count = 0
-    while step_count < final_step_count:
-        step_count += 1
-        moons_step_1000 = simulate(moon_list=moons_step_1000)
+    moon_system = MoonSystem.build_from_moons(moon_list=moons_step_0)
+    moon_system.step(num_steps=final_step_count)
 
     # Part 1: What is the total energy in the system?
-    part_1_answer = sum([x.total_energy for x in moons_step_1000])
+    part_1_answer = moon_system.total_energy
 
     # Determine the number of steps that must occur before all of the moons' positions and velocities exactly match a
     # previous point in time.
-    moons_step_n = copy.deepcopy(moons_step_0)
-    steps_to_reset = calculate_steps_until_state_resets(moon_list=moons_step_n)
+    steps_to_reset = calculate_steps_until_state_resets(moon_list=moons_step_0, num_workers=3)
 
     # Part 2: How many steps were required?
     part_2_answer = steps_to_reset
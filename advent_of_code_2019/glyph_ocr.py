@@ -0,0 +1,113 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+LETTER_GLYPHS: Dict[str, List[str]] = {
+    'A': ['.##.', '#..#', '#..#', '####', '#..#', '#..#'],
+    'B': ['###.', '#..#', '###.', '#..#', '#..#', '###.'],
+    'C': ['.##.', '#..#', '#...', '#...', '#..#', '.##.'],
+    'E': ['####', '#...', '###.', '#...', '#...', '####'],
+    'F': ['####', '#...', '###.', '#...', '#...', '#...'],
+    'G': ['.##.', '#..#', '#...', '#.##', '#..#', '.###'],
+    'H': ['#..#', '#..#', '####', '#..#', '#..#', '#..#'],
+    'I': ['.###', '..#.', '..#.', '..#.', '..#.', '.###'],
+    'J': ['..##', '...#', '...#', '...#', '#..#', '.##.'],
+    'K': ['#..#', '#.#.', '##..', '#.#.', '#.#.', '#..#'],
+    'L': ['#...', '#...', '#...', '#...', '#...', '####'],
+    'O': ['.##.', '#..#', '#..#', '#..#', '#..#', '.##.'],
+    'P': ['###.', '#..#', '#..#', '###.', '#...', '#...'],
+    'R': ['###.', '#..#', '#..#', '###.', '#.#.', '#..#'],
+    'S': ['.###', '#...', '#...', '.##.', '...#', '###.'],
+    'U': ['#..#', '#..#', '#..#', '#..#', '#..#', '.##.'],
+    'Y': ['#...#', '#...#', '.#.#.', '..#..', '..#..', '..#..'],
+    'Z': ['####', '...#', '..#.', '.#..', '#...', '####'],
+}
+"""The upper case letters drawn by the puzzles, 6 pixels tall. '#' is a lit pixel and '.' is a dark pixel. """
+
+LETTER_PITCH = 5
+"""The number of columns in the cell of each letter. Most letters leave the last column blank, but 'Y' fills it. """
+
+
+class UnknownGlyphError(ValueError):
+    """Exception that is thrown if a glyph does not match any of the LETTER_GLYPHS."""
+    pass
+
+
+def pack_glyph(glyph: np.ndarray) -> Tuple[int, int, int]:
+    """ Pack a binary glyph into an integer so it can be used as a dictionary key
+
+    :param glyph: 2D boolean array where True is a lit pixel
+    :type glyph: np.ndarray
+    :return: (height, width, bitmask) where the bits of the bitmask are the pixels in row-major order
+    :rtype: Tuple[int, int, int]
+    """
+    height, width = glyph.shape
+    # Python int is used for the bitmask so glyphs larger than 64 pixels do not overflow
+    bits = np.packbits(glyph.ravel()).tobytes()
+    return height, width, int.from_bytes(bits, byteorder='big')
+
+
+def _trim_blank_columns(image: np.ndarray) -> np.ndarray:
+    lit_columns = np.flatnonzero(image.any(axis=0))
+    if len(lit_columns) == 0:
+        return image[:, 0:0]
+    return image[:, lit_columns[0]:lit_columns[-1] + 1]
+
+
+def _build_glyph_lookup() -> Dict[Tuple[int, int, int], str]:
+    glyph_lookup: Dict[Tuple[int, int, int], str] = dict()
+    for letter, row_list in LETTER_GLYPHS.items():
+        glyph = np.array([[pixel == '#' for pixel in row] for row in row_list])
+        # Glyphs are split on blank columns, so a letter such as 'I' is stored without its blank left column
+        glyph_lookup[pack_glyph(_trim_blank_columns(glyph))] = letter
+    return glyph_lookup
+
+
+GLYPH_LOOKUP: Dict[Tuple[int, int, int], str] = _build_glyph_lookup()
+"""The letter of each packed glyph, see pack_glyph. """
+
+
+def split_glyphs(image: np.ndarray) -> List[np.ndarray]:
+    """ Split a rendered image into glyphs. The glyphs are separated by columns that have no lit pixels.
+    A letter that fills its whole cell, such as 'Y', touches the next letter, so a run of lit columns wider than
+    LETTER_PITCH is split every LETTER_PITCH columns. Rows above and below the text are removed.
+
+    :param image: 2D array where any non-zero value is a lit pixel, with row 0 at the top
+    :type image: np.ndarray
+    :return: The views of each glyph from left to right
+    :rtype: List[np.ndarray]
+    """
+    lit = np.asarray(image) != 0
+    lit_rows = np.flatnonzero(lit.any(axis=1))
+    if len(lit_rows) == 0:
+        return list()
+    lit = lit[lit_rows[0]:lit_rows[-1] + 1]
+
+    # Find where each run of lit columns starts and stops
+    lit_columns = np.concatenate(([0], lit.any(axis=0).astype(np.int8), [0]))
+    edges = np.diff(lit_columns)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    glyph_list = list()
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        for cell_start in range(start, stop, LETTER_PITCH):
+            glyph_list.append(_trim_blank_columns(lit[:, cell_start:min(cell_start + LETTER_PITCH, stop)]))
+    return glyph_list
+
+
+def read_glyphs(image: np.ndarray) -> str:
+    """ Convert a rendered image of upper case letters into a string
+
+    :param image: 2D array where any non-zero value is a lit pixel, with row 0 at the top
+    :type image: np.ndarray
+    :return: The letters in the image
+    :rtype: str
+    """
+    letters = list()
+    for glyph in split_glyphs(image):
+        key = pack_glyph(glyph)
+        if key not in GLYPH_LOOKUP:
+            rows = '\n'.join(''.join('#' if pixel else '.' for pixel in row) for row in glyph.tolist())
+            raise UnknownGlyphError(f'The glyph does not match a known letter:\n{rows}')
+        letters.append(GLYPH_LOOKUP[key])
+    return ''.join(letters)